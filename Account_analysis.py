@@ -12,28 +12,28 @@ import src.DataHandler as data_handler
 import streamlit_antd_components as sac
 from src.utils.constants import WATCHED, WATCHLIST, PALETTE
 
-# imports CSS
-
-with open('src/styles/main_interface.css') as f:
-    css = f.read()
-with open('src/styles/general_metrics.css') as f:
-    css += f.read()
-with open('src/styles/graph.css') as f:
-    css += f.read()
-with open('src/styles/background.css') as f:
-    css += f.read()
-with open('src/styles/example.css') as f:
-    css += f.read()
+# imports CSS et html : lus une seule fois par process
+
+@st.cache_resource
+def load_static_assets():
+    css = ""
+    for name in ['main_interface', 'general_metrics', 'graph', 'background', 'example']:
+        with open(f'src/styles/{name}.css') as f:
+            css += f.read()
+    with open("src/html/bottom_bar.html") as f:
+        bottom_bar = f.read()
+    with open("src/html/main_title_and_instructions.html") as f:
+        main_title_and_instructions = f.read()
+    return css, bottom_bar, main_title_and_instructions
+
+css, bottom_bar, main_title_and_instructions = load_static_assets()
 st.markdown(f'<style>{css}</style>', unsafe_allow_html=True)
-
-# imports html
-with open("src/html/bottom_bar.html") as f:
-    bottom_bar = f.read()
-with open("src/html/main_title_and_instructions.html") as f:
-    main_title_and_instructions = f.read()
 ###
 
-data_handler = data_handler.DataHandler()
+# Un DataHandler par session : l'upload traité survit aux reruns (changement d'année, de catégorie, clic sur la carte)
+if "data_handler" not in st.session_state:
+    st.session_state["data_handler"] = data_handler.DataHandler()
+data_handler = st.session_state["data_handler"]
 
 st.set_page_config(
     page_title="Letterboxd analysis",
@@ -339,12 +339,12 @@ def main_interface():
                 fig = data_handler.comparaison_rating()
                 st.plotly_chart(fig, key="comparaison_rating")
 
-            fig = data_handler.generate_wordcloud()
-            if fig is not None:
+            image = data_handler.generate_wordcloud()
+            if image is not None:
                 st.subheader("A wordcloud with all your :blue[reviews]", divider=False, anchor=False)
                 #col1, col2, col3 = st.columns([1, 2, 1])
                 #with col2:
-                st.pyplot(fig,width="content")
+                st.image(image, width="stretch")
 
 #
 
@@ -412,8 +412,6 @@ def prepare_wrapped():
     )
 app()
 
-data_handler.temp_dir.cleanup()  # Nettoyage du dossier temporaire
-
 st.markdown("---")
 
 #st.sidebar.title("About")
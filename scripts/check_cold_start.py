@@ -0,0 +1,81 @@
+# modules externes
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules importés par Account_analysis.py au chargement de la page
+ENTRY_MODULES = [
+    'streamlit',
+    'streamlit_antd_components',
+    'src.utils.utils',
+    'src.services.radar_graph',
+    'src.DataHandler',
+    'src.utils.constants',
+]
+# Modules lourds propres à une fonctionnalité : ils ne doivent être chargés qu'au premier usage
+LAZY_MODULES = [
+    'wordcloud',
+    'matplotlib',
+    'pycountry',
+    'stop_words',
+    'requests',
+    'psycopg',
+    'src.graph.GraphMaker',
+    'src.graph.WrappedGenerator',
+    'src.services.ApiHandler',
+]
+# Budget par défaut (secondes) pour importer ENTRY_MODULES dans un process neuf
+DEFAULT_BUDGET = 2.5
+DEFAULT_RUNS = 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Exécuté dans un process neuf : rien n'est déjà en cache dans sys.modules
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure():
+    """ Temps d'import de ENTRY_MODULES et modules paresseux déjà chargés, dans un interpréteur neuf"""
+    code = PROBE.format(modules=ENTRY_MODULES, lazy=LAZY_MODULES)
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Import failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie le temps de démarrage à froid de Account_analysis.py")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="temps d'import maximal (médiane, en secondes)")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help="nombre de mesures")
+    args = parser.parse_args()
+
+    # la première mesure chauffe le cache disque et les .pyc : on ne la garde pas
+    measure()
+    runs = [measure() for _ in range(args.runs)]
+    median = statistics.median(run['elapsed'] for run in runs)
+    loaded = sorted({module for run in runs for module in run['loaded']})
+
+    print(f"cold start import: {median:.3f}s (median of {args.runs}, budget {args.budget:.2f}s)")
+    failed = False
+    if median > args.budget:
+        print(f"FAIL: import time exceeds the budget by {median - args.budget:.3f}s")
+        failed = True
+    if loaded:
+        print(f"FAIL: modules that should be lazy are loaded at startup: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
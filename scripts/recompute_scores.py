@@ -0,0 +1,26 @@
+# modules externes
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# lancé comme un script (python scripts/recompute_scores.py) : src doit être importable
+sys.path.insert(0, ROOT)
+
+# modules internes
+from src.services.user_service import UserService
+
+
+def main():
+    # les secrets (.streamlit/secrets.toml) sont lus depuis le dossier courant, comme avec streamlit run
+    parser = argparse.ArgumentParser(
+        description="Recalcule les scores du radar de tous les profils de user_stats sur la population actuelle"
+    )
+    parser.parse_args()
+
+    scores = UserService().recompute_all_scores()
+    print(f"{len(scores)} profiles rescored")
+
+
+if __name__ == '__main__':
+    main()
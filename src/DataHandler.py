@@ -1,39 +1,114 @@
 # modules externes
 import zipfile
+import io
+import importlib.util
+import functools
 import pandas as pd
-import tempfile
 from datetime import datetime
-import pycountry
-from stop_words import get_stop_words
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # modules internes
-import src.graph.WrappedGenerator as wrapped_generator
-import src.services.ApiHandler as api_handler
 import src.services.movie_service as movies_service
 import src.services.user_service as user_service
 import src.services.error_service as error_service
-import src.graph.GraphMaker as graph_maker
+import src.services.upload_cache as upload_cache
+import src.services.country_resolver as country_resolver
 from src.utils.utils import *
-from src.services.radar_graph import compute_radar_stats_for_sheet
-from src.utils.constants import WATCHLIST, WATCHED
+from src.services.radar_graph import compute_radar_stats
+from src.services.upload_cache import fingerprint_bytes
+from src.services.key_scheduler import KeysExhaustedError
+from src.utils.constants import WATCHLIST, WATCHED, OMDB_MAX_WORKERS, OMDB_TITLE_ERRORS, UPLOAD_MAX_MEMBER_SIZE, UPLOAD_CACHE_VERSION, CHART_CACHE_ENTRIES
+from src.utils.lru_cache import LRUCache
+
+# Fichiers CSV attendus dans l'export Letterboxd : colonnes utilisées et leurs types.
+# Les autres colonnes (Letterboxd URI, Tags, Rewatch, ...) ne sont pas chargées.
+FILM_COLUMNS = {'Date': None, 'Name': 'str', 'Year': 'float64'}
+CSV_SCHEMAS = {
+    'watchlist': FILM_COLUMNS,
+    'watched':   FILM_COLUMNS,
+    'ratings':   {**FILM_COLUMNS, 'Rating': 'float64'},
+    'reviews':   {**FILM_COLUMNS, 'Review': 'str'},
+    'profile':   {'Date Joined': None, 'Username': 'str'},
+    'comments':  {'Date': None},
+}
+CSV_FILES = list(CSV_SCHEMAS)
+# Colonnes lues comme dates (type None dans les schémas)
+CSV_DATE_COLUMNS = {'Date', 'Date Joined'}
+# pyarrow lit les CSV plus vite, mais reste optionnel (il n'est pas importé ici, pandas le chargera à la lecture)
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+# Attributs calculés à partir d'un upload et mis en cache
+CACHED_ATTRIBUTES = [
+    'watchlist', 'watched', 'rating', 'reviews', 'profile', 'comments',
+    'quartile', 'watched_mg', 'watchlist_mg', 'rating_mg', 'bridges', 'review_index', 'radar_stats'
+]
+
+# Valeur absente du cache (un graphique peut valoir None, ex : pas de critiques pour le wordcloud)
+CHART_MISSING = object()
+
+def cached_chart(per_year=True):
+    """ Mémoïse une méthode de graphique dans self.chart_cache.
+    Clé : (empreinte de l'upload, année sélectionnée, nom du graphique, arguments) ; per_year=False pour un graphique
+    qui ne dépend pas de l'année sélectionnée. Un changement d'année ou d'upload donne une autre clé : rien à invalider."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            key = (self.fingerprint, self.year if per_year else None, method.__name__, *args)
+            chart = self.chart_cache.get(key, CHART_MISSING)
+            if chart is CHART_MISSING:
+                chart = method(self, *args)
+                self.chart_cache.put(key, chart)
+            return chart
+        return wrapper
+    return decorator
 
 class DataHandler:
 
     def __init__(self):
-        self.api_handler    = api_handler.ApiHandler()
+        self._api_handler   = None
         self.movie_service  = movies_service.MovieService()
         self.user_service  = user_service.UserService()
         self.error_service  = error_service.ErrorService()
-        self.graph_maker    = graph_maker.GraphMaker()
-        self.temp_dir       = tempfile.TemporaryDirectory()
-        self.wrapped_generator = wrapped_generator.WrappedGenerator(self)
-        self.temp_name      = self.temp_dir.name
+        self._graph_maker   = None
+        self._wrapped_generator = None
+        self.upload_cache   = upload_cache.get_upload_cache()
+        self.loaded_upload  = None
+        self.chart_cache    = LRUCache(CHART_CACHE_ENTRIES)
+
+    # Modules lourds (requests, plotly, wordcloud, PIL, pycountry) chargés au premier usage :
+    # la page d'accueil, qui n'affiche que l'uploader, n'en a pas besoin
+
+    @property
+    def api_handler(self):
+        if self._api_handler is None:
+            import src.services.ApiHandler as api_handler
+            self._api_handler = api_handler.ApiHandler()
+        return self._api_handler
+
+    @property
+    def graph_maker(self):
+        if self._graph_maker is None:
+            import src.graph.GraphMaker as graph_maker
+            self._graph_maker = graph_maker.GraphMaker()
+        return self._graph_maker
+
+    @property
+    def wrapped_generator(self):
+        if self._wrapped_generator is None:
+            import src.graph.WrappedGenerator as wrapped_generator
+            self._wrapped_generator = wrapped_generator.WrappedGenerator(self)
+        return self._wrapped_generator
+
+    @property
+    def country_resolver(self):
+        return country_resolver.get_country_resolver()
+
+    def get_films(self, dfF, my_bar,movie_not_dl,upload_name, max_workers=OMDB_MAX_WORKERS):
+        """ Récupère les films manquants dans all_movies à partir de dfF.
+        Les appels OMDB sont faits en parallèle, avec au plus max_workers requêtes en vol.
+        La barre de progression est mise à jour depuis le thread principal (Streamlit n'accepte pas les autres)."""
 
-    def get_films(self, dfF, my_bar,movie_not_dl,upload_name):
-        """ Récupère les films manquants dans all_movies à partir de dfF"""
-        
         df_errors   = []
         df_movies   = []
 
@@ -41,37 +116,91 @@ class DataHandler:
 
         total_movies = len(missing_movies_df)
 
-        pairs = set(zip(movie_not_dl["Title"], movie_not_dl["Year"].astype(str)))
+        # années en int des deux côtés (Year est un float dans dfF)
+        pairs = set(zip(movie_not_dl["Title"], movie_not_dl["Year"].astype(int)))
+        # cache négatif : films qui échouent régulièrement, on ne dépense pas de quota pour eux
+        known_errors = self.error_service.get_known_errors()
 
-        for i, (_, row) in enumerate(missing_movies_df.iterrows()):
-            try:
-                #on regarde si le film n'est pas dans la liste des films à ne pas télécharger
-                if((row['Name'], row['Year']) in pairs):
-                    df_errors.append([upload_name, "Movie not dl", *row.values])
-                else:
-                    films_data,status_code = self.api_handler.get_movie_data_by_title(row['Name'], row['Year'])
-                    if status_code ==503:
-                        return None
-                    if films_data.get('Error') is not None:
-                        df_errors.append([upload_name, films_data['Error'], *row.values])
-                    else:
-                        films_data['Title'] = row['Name']
-                        df_movies.append(films_data)
-            except Exception as e:
-                # sentry_sdk.capture_message(f"Movie not found: {row.to_dict()}")
-                df_errors.append([upload_name, str(e), *row.values])
-           
+        def update_bar(done):
             my_bar.progress(
-                int(100 * (i+1) / total_movies),
+                int(100 * done / total_movies),
                 text="Getting movie data, Please wait. (It's a free project, so there might be data limitations or errors in the dataset)"
             )
+
+        done = 0
+        keys_exhausted = False
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {}
+            for _, row in missing_movies_df.iterrows():
+                movie_key = (row['Name'], int(row['Year']))
+                #on regarde si le film n'est pas dans la liste des films à ne pas télécharger
+                if movie_key in pairs:
+                    df_errors.append([upload_name, "Movie not dl", *row.values])
+                    done += 1
+                    update_bar(done)
+                elif movie_key in known_errors:
+                    # déjà dans la table errors : on ne le recompte pas, sinon il n'expirerait jamais
+                    done += 1
+                    update_bar(done)
+                else:
+                    future = executor.submit(self.api_handler.get_movie_data_by_title, row['Name'], row['Year'])
+                    futures[future] = row
+
+            pending = set(futures)
+            while pending:
+                for future in as_completed(pending):
+                    pending.discard(future)
+                    row = futures[future]
+                    cancel = False
+                    try:
+                        films_data,status_code = future.result()
+                        if status_code ==503:
+                            # l'API est indisponible : on annule les requêtes qui n'ont pas encore commencé
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            return None
+                        if status_code >= 500:
+                            # erreur passagère : pas enregistrée, elle fausserait le compteur du cache négatif
+                            logging.info(f"OMDB error {status_code} for {row['Name']} ({row['Year']})")
+                        elif films_data.get('Error') is not None:
+                            if status_code == 200 and films_data['Error'] in OMDB_TITLE_ERRORS:
+                                df_errors.append([upload_name, films_data['Error'], *row.values])
+                            else:
+                                # erreur de clé ou de compte : elle ne dit rien du film, on ne l'enregistre pas non plus
+                                logging.info(f"OMDB error {status_code} for {row['Name']} ({row['Year']}): {films_data['Error']}")
+                        else:
+                            films_data['Title'] = row['Name']
+                            df_movies.append(films_data)
+                    except KeysExhaustedError:
+                        # plus aucune clé : les requêtes suivantes échoueraient toutes
+                        cancel = not keys_exhausted
+                        keys_exhausted = True
+                    except Exception as e:
+                        # sentry_sdk.capture_message(f"Movie not found: {row.to_dict()}")
+                        # timeout... : on ne l'enregistre pas dans errors
+                        logging.info(f"OMDB request failed for {row['Name']} ({row['Year']}): {e}")
+                    done += 1
+                    update_bar(done)
+                    if cancel:
+                        logging.info("no more API keys")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        # as_completed ne rend jamais une future annulée : on ne suit plus que les requêtes déjà en vol
+                        pending = {f for f in pending if not f.cancelled()}
+                        break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.api_handler.flush_key_usage()
+
         if df_errors:
             df_errors_df = pd.DataFrame(df_errors, columns=['File', 'Error', *dfF.columns])
             self.error_service.add_error_db(df_errors_df)
 
         if df_movies:
-            df_movies_df = pd.DataFrame(df_movies)
+            # valeurs converties une seule fois : les mêmes nombres vont en base et dans all_movies
+            df_movies_df = self.movie_service.parse_movies(pd.DataFrame(df_movies))
             self.movie_service.insert_movies_to_db(df_movies_df)
+            # mêmes noms de colonnes que les films lus en base (Title -> title...)
+            df_movies_df.columns = df_movies_df.columns.str[:1].str.lower() + df_movies_df.columns.str[1:]
             all_movies = pd.concat([existing_movies_df, df_movies_df]).drop_duplicates(subset=['title', 'year'])
         else:
             all_movies = existing_movies_df
@@ -88,68 +217,31 @@ class DataHandler:
         return self.watched_df
 
     def setup_user_upload(self, uploaded_files, my_bar,exemple):
-        """ Configure les données de l'utilisateur à partir du fichier zip téléchargé"""
+        """ Configure les données de l'utilisateur à partir du fichier zip téléchargé.
+        Le résultat est mis en cache avec l'empreinte du contenu : un même export n'est traité qu'une fois.
+        Le DataHandler vit dans la session : si l'upload n'a pas changé depuis le dernier rerun, il n'y a rien à faire."""
         if uploaded_files is not None:
+            upload_key = self.upload_key(uploaded_files, exemple)
+            if upload_key == self.loaded_upload:
+                return
             try:
-                if exemple is None:
-                    self.uploaded_files = uploaded_files
-                    tmp_name=self.temp_name
-                    with zipfile.ZipFile(uploaded_files, 'r') as zip_ref:
-                        zip_ref.extractall(tmp_name)
+                self.fingerprint = self.upload_fingerprint(uploaded_files, exemple)
+                cached = self.upload_cache.get(self.fingerprint)
+                if cached is not None:
+                    self.restore_upload(cached)
                 else:
-                    self.uploaded_files=exemple
-                    tmp_name=exemple
-                # Lecture des fichiers CSV attendus
-                csv_files = ['watchlist', 'watched', 'ratings', 'reviews', 'profile', 'comments']
-                dataframes = {}
-                for csv_name in csv_files:
-                    file_path = os.path.join(tmp_name, f'{csv_name}.csv')
-                    dataframes[csv_name] = self.safe_read_csv(file_path,f'{csv_name}.csv')
-
-                self.watchlist  = dataframes['watchlist']
-                self.watched    = dataframes['watched']
-                self.rating     = dataframes['ratings']
-                self.reviews    = dataframes['reviews']
-                self.profile    = dataframes['profile']
-                self.comments   = dataframes['comments']
-
-                # Nettoyage des années
-                for attr in ['watchlist', 'watched', 'rating']:
-                    setattr(self, attr, clean_year(getattr(self, attr)))
-
-                self.watched_and_watchlist = pd.concat([self.watched, self.watchlist])
-                # Enrichissement des références
-                movie_return=self.get_films( self.watched_and_watchlist, my_bar,self.movie_service.get_movie_not_dl(),tmp_name)
-                if movie_return is not None:
-                    all_movies = movie_return
-                else:
-                    erreur_api()
-
-                
-                all_movies = clean_small_films(all_movies)
-                self.quartile = self.movie_service.get_quantile()
-                all_movies = bind_categories(all_movies, self.quartile)
-                # Fichiers spécfiques à l'utilisateur
-                # mg = merge = méga fichier avec tous les films et les données intéressantes
-               
-                self.watched_mg     = pd.merge(self.watched, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
-                self.watchlist_mg   = pd.merge(self.watchlist, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
-                self.rating_mg      = pd.merge(self.rating, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
-
-                self.rating_mg['Rating'] = self.rating_mg['Rating'] * 2
-                self.rating_mg = clean_imdbr(self.rating_mg)
-                self.rating_mg['diff_rating'] = self.rating_mg['Rating'] - self.rating_mg['imdbRating']
-
-                self.radar_stats = compute_radar_stats_for_sheet(
-                     self.quartile, self.watched_mg, self.rating_mg,
-                    self.reviews, self.comments, 
-                    self.user_service.get_all_user_stats()
-                )
+                    self.process_upload(uploaded_files, my_bar, exemple)
+                    self.upload_cache.put(self.fingerprint, self.snapshot_upload())
+                self.build_year_partitions()
+                self.build_diary()
+                # les graphiques de l'upload précédent ne seront plus demandés
+                self.chart_cache.clear()
 
                 if(st.secrets['prod']==True):
                     self.user_service.add_profiles_to_db(self.profile.iloc[0], self.radar_stats)
 
                 self.radar_means = self.user_service.get_all_means()
+                self.loaded_upload = upload_key
 
             except zipfile.BadZipFile:
                 st.session_state["uploader_key"] += 1
@@ -166,10 +258,142 @@ class DataHandler:
                 print(e)
                 st.error(f"An error occurred: {e}", icon="⚠️")
 
+    def upload_key(self, uploaded_files, exemple):
+        """ Identifiant de l'upload courant, sans lire son contenu"""
+        if exemple is None:
+            return ('zip', uploaded_files.file_id)
+        return ('exemple', exemple)
+
+    def upload_fingerprint(self, uploaded_files, exemple):
+        """ Empreinte du contenu de l'upload (zip ou fichiers de l'exemple).
+        UPLOAD_CACHE_VERSION en fait partie : les entrées d'un ancien format ne sont jamais relues."""
+        version = str(UPLOAD_CACHE_VERSION).encode()
+        if exemple is None:
+            return fingerprint_bytes(version, uploaded_files.getvalue())
+        contents = [version]
+        for csv_name in CSV_FILES:
+            with open(os.path.join(exemple, f'{csv_name}.csv'), 'rb') as f:
+                contents.append(f.read())
+        return fingerprint_bytes(*contents)
+
+    def process_upload(self, uploaded_files, my_bar, exemple):
+        """ Lit les CSV, complète les films via la base / OMDB et calcule les stats du radar"""
+        if exemple is None:
+            self.uploaded_files = uploaded_files
+            upload_name = uploaded_files.name
+        else:
+            self.uploaded_files=exemple
+            upload_name = exemple
+        # Lecture des fichiers CSV attendus
+        dataframes = self.read_upload_csvs(uploaded_files, exemple)
+
+        self.watchlist  = dataframes['watchlist']
+        self.watched    = dataframes['watched']
+        self.rating     = dataframes['ratings']
+        self.reviews    = dataframes['reviews']
+        self.profile    = dataframes['profile']
+        self.comments   = dataframes['comments']
+
+        # Nettoyage des années
+        for attr in ['watchlist', 'watched', 'rating']:
+            setattr(self, attr, clean_year(getattr(self, attr)))
+
+        self.watched_and_watchlist = pd.concat([self.watched, self.watchlist])
+        # Enrichissement des références
+        movie_return=self.get_films( self.watched_and_watchlist, my_bar,self.movie_service.get_movie_not_dl(),upload_name)
+        if movie_return is not None:
+            all_movies = movie_return
+        else:
+            erreur_api()
+
+        
+        all_movies = clean_small_films(all_movies)
+        self.quartile = self.movie_service.get_quantile()
+        all_movies = bind_categories(all_movies, self.quartile)
+        # identifiant de film commun aux trois fichiers fusionnés, clé des tables pont
+        all_movies = all_movies.reset_index(drop=True)
+        all_movies['movie_id'] = all_movies.index
+        self.bridges = build_bridges(all_movies)
+        # code ISO de chaque pays (plusieurs noms OMDB peuvent donner le même code : West Germany, Germany...)
+        countries = self.bridges['countries']
+        countries['code'] = self.country_resolver.codes_of(countries['country'].astype(str)).astype('category')
+        self.bridges['countries'] = countries.drop_duplicates(subset=['movie_id', 'code'])
+        # Fichiers spécfiques à l'utilisateur
+        # mg = merge = méga fichier avec tous les films et les données intéressantes
+       
+        self.watched_mg     = pd.merge(self.watched, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
+        self.watchlist_mg   = pd.merge(self.watchlist, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
+        self.rating_mg      = pd.merge(self.rating, all_movies, how='inner', left_on=["Name", "Year"], right_on=["title", "year"])
+
+        self.rating_mg['Rating'] = self.rating_mg['Rating'] * 2
+        self.rating_mg = clean_imdbr(self.rating_mg)
+        self.rating_mg['diff_rating'] = self.rating_mg['Rating'] - self.rating_mg['imdbRating']
+
+        self.review_index = build_review_index(self.reviews, get_review_stopwords())
+
+        self.radar_stats = compute_radar_stats(
+            self.quartile, self.watched_mg, self.rating_mg,
+            self.reviews, self.comments,
+            self.user_service.get_radar_ranks,
+            self.bridge_rows(self.watched_mg, 'genres', [])['genre']
+        )
+
+    def snapshot_upload(self):
+        """ Ce qui est mis en cache pour un upload"""
+        return {attr: getattr(self, attr) for attr in CACHED_ATTRIBUTES}
+
+    def restore_upload(self, cached):
+        """ Recharge un upload depuis le cache. Les DataFrames sont copiés : le cache est partagé entre les sessions."""
+        for attr, value in cached.items():
+            setattr(self, attr, value.copy() if isinstance(value, pd.DataFrame) else value)
+
+    def read_upload_csvs(self, uploaded_files, exemple):
+        """ Lit les CSV attendus, directement depuis l'archive (rien n'est extrait sur disque).
+        Seuls les membres de CSV_FILES sont décompressés ; l'exemple est lu depuis son dossier."""
+        dataframes = {}
+        if exemple is not None:
+            for csv_name in CSV_FILES:
+                file_path = os.path.join(exemple, f'{csv_name}.csv')
+                dataframes[csv_name] = self.safe_read_csv(file_path,f'{csv_name}.csv')
+            return dataframes
+
+        with zipfile.ZipFile(uploaded_files, 'r') as zip_ref:
+            for csv_name in CSV_FILES:
+                file_name = f'{csv_name}.csv'
+                dataframes[csv_name] = self.safe_read_csv(self.read_zip_member(zip_ref, file_name), file_name)
+        return dataframes
+
+    def read_zip_member(self, zip_ref, file_name):
+        """ Décompresse un membre de l'archive en mémoire, au plus UPLOAD_MAX_MEMBER_SIZE octets.
+        La taille annoncée dans l'archive n'est pas fiable : la lecture elle-même est bornée."""
+        try:
+            info = zip_ref.getinfo(file_name)
+        except KeyError:
+            raise FileNotFoundError(file_name)
+        if info.file_size > UPLOAD_MAX_MEMBER_SIZE:
+            self.member_too_large(file_name)
+        with zip_ref.open(info) as member:
+            content = member.read(UPLOAD_MAX_MEMBER_SIZE + 1)
+        if len(content) > UPLOAD_MAX_MEMBER_SIZE:
+            self.member_too_large(file_name)
+        return io.BytesIO(content)
+
+    def member_too_large(self, file_name):
+        st.session_state["exemple"] = 0
+        st.error(f"File {file_name} is too large (max {UPLOAD_MAX_MEMBER_SIZE // (1024 * 1024)} MB)", icon="⚠️")
+        st.stop()
+
     def safe_read_csv(self, file_path,file_name):
-        """ Lit un fichier CSV en gérant les erreurs"""
+        """ Lit un fichier CSV (chemin ou buffer) avec son schéma, en gérant les erreurs"""
+        schema = CSV_SCHEMAS[file_name.removesuffix('.csv')]
         try:
-            return pd.read_csv(file_path)
+            return pd.read_csv(
+                file_path,
+                engine=CSV_ENGINE,
+                usecols=list(schema),
+                dtype={column: dtype for column, dtype in schema.items() if dtype is not None},
+                parse_dates=[column for column in schema if column in CSV_DATE_COLUMNS],
+            )
         except FileNotFoundError:
             st.session_state["exemple"] = 0
             st.error(f"File {file_name} not found. We need all the csv files of the zipfile", icon="⚠️")
@@ -180,6 +404,7 @@ class DataHandler:
 
 ### Méthodes spécifiques à la gestion des données
 
+    @cached_chart()
     def general_metrics_div(self):
         """ Récupère les stats générales"""
         metrics = [
@@ -200,6 +425,55 @@ class DataHandler:
         years = ["Alltime"] + list(sorted(range(dateJoined, current_year + 1), reverse=True))
         return years
 
+    def build_year_partitions(self):
+        """ Découpe une fois par upload les fichiers par année de visionnage.
+        set_year ne fait ensuite qu'une lecture dans un dict."""
+        self.year_partitions = {
+            attr: partition_by_year(getattr(self, attr))
+            for attr in ['watched_mg', 'watchlist_mg', 'rating_mg', 'reviews']
+        }
+
+    def build_diary(self):
+        """ Films vus par jour sur toute la période du journal (de l'inscription à aujourd'hui), calculé une fois par upload :
+        date, nombre de films, liste des titres déjà mise en forme, jour de la semaine et numéro de semaine (%W).
+        Le calendrier d'une année n'est ensuite qu'une tranche de ces tableaux (diary_year)."""
+        dates = self.watched_mg['Date'].dt.normalize()
+        titles = self.watched_mg.loc[dates.notna(), 'title']
+        dates = dates.dropna()
+
+        years = [year for year in self.get_years() if year != "Alltime"]
+        if not dates.empty:
+            years += [dates.min().year, dates.max().year]
+        days = pd.date_range(get_year_bounds(min(years))[0], get_year_bounds(max(years))[1], freq='D')
+
+        offsets = (dates - days[0]).dt.days.to_numpy()
+        films_list = np.full(len(days), '', dtype=object)
+        titles_by_day = titles.groupby(offsets).agg('<br> • '.join)
+        films_list[titles_by_day.index] = '<br> • ' + titles_by_day.to_numpy()
+
+        weekday = days.weekday.to_numpy()
+        self.diary = {
+            'date': days,
+            'label': days.strftime('%Y-%m-%d').to_numpy(),
+            'count': np.bincount(offsets, minlength=len(days)),
+            'films_list': films_list,
+            'weekday': weekday,
+            # semaines commençant le lundi, la semaine 0 précède le premier lundi de l'année (comme strftime("%W"))
+            'week': (days.dayofyear.to_numpy() - 1 + 7 - weekday) // 7,
+        }
+
+    def diary_year(self, year):
+        """ Tranche (sans copie) du journal pour une année"""
+        first_day, last_day = get_year_bounds(year)
+        start = (pd.Timestamp(first_day) - self.diary['date'][0]).days
+        end = (pd.Timestamp(last_day) - self.diary['date'][0]).days + 1
+        return {name: values[start:end] for name, values in self.diary.items()}
+
+    def year_partition(self, attr, year):
+        """ Sous-DataFrame de l'année (vide si aucun film cette année-là)"""
+        df = getattr(self, attr)
+        return self.year_partitions[attr].get(year, df.iloc[0:0])
+
     def set_year(self, selected_year):
         """ Définit l'année de visionnage"""
         if selected_year == "Alltime":
@@ -209,39 +483,46 @@ class DataHandler:
             self.reviews_df = self.reviews
         else:
             selected_year = int(selected_year)
-            self.watched_df = extract_year(self.watched_mg, selected_year)
-            self.watchlist_df = extract_year(self.watchlist_mg, selected_year)
-            self.rating_df = extract_year(self.rating_mg, selected_year)
-            self.reviews_df = extract_year(self.reviews, selected_year)
-        self.corpus = clean_reviews(self.reviews_df)
+            self.watched_df = self.year_partition('watched_mg', selected_year)
+            self.watchlist_df = self.year_partition('watchlist_mg', selected_year)
+            self.rating_df = self.year_partition('rating_mg', selected_year)
+            self.reviews_df = self.year_partition('reviews', selected_year)
         self.year = selected_year
 
+    def bridge_rows(self, df, table, columns=('title',), role=None):
+        """ Équivalent d'un explode sur les films de df : une ligne par (film, valeur de la table pont),
+        avec les colonnes demandées de df (None = toutes). role filtre la table people ('actor' ou 'director')."""
+        bridge = self.bridges[table]
+        if role is not None:
+            bridge = bridge.loc[bridge['role'] == role, ['movie_id', 'person']]
+        values = bridge.columns.drop('movie_id')
+        if columns is None:
+            columns = [column for column in df.columns if column not in values and column != 'movie_id']
+        rows = df[['movie_id', *columns]].merge(bridge, on='movie_id')
+        # seules les valeurs présentes dans df restent dans les catégories (value_counts, groupby)
+        for column in values:
+            rows[column] = rows[column].cat.remove_unused_categories()
+        return rows
+
 ### Gestion des graphiques
 
+    @cached_chart()
     def genre(self, key):
         """ Prépare les data pour le GraphMaker et renvoie le graphique à l'interface"""
         if key == WATCHED:
-            df_genres = self.watched_df[['title', 'year','genre']].dropna()
+            df_genres_exploded = self.bridge_rows(self.watched_df, 'genres', ['title', 'year'])
         elif key == WATCHLIST:
-            df_genres = self.watchlist_df[['title', 'year','genre']].dropna()
-
-        df_genres['genre'] = df_genres['genre'].str.split(', ')
-        df_genres_exploded = df_genres.explode('genre')
+            df_genres_exploded = self.bridge_rows(self.watchlist_df, 'genres', ['title', 'year'])
 
         return self.graph_maker.graph_genre(df_genres_exploded)
     
+    @cached_chart()
     def actor(self, key):
         if key == WATCHED:
-            #nb_actor = self.watched_df['actors'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-            df=self.watched_df.copy()
+            df=self.watched_df
         elif key == WATCHLIST:
             df=self.watchlist_df
-            #nb_actor = self.watchlist_df['actors'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-        df_exploded = (
-            df.dropna(subset=['actors'])
-            .assign(Actor=df['actors'].str.split(', '))
-            .explode('Actor')
-        )
+        df_exploded = self.bridge_rows(df, 'people', role='actor').rename(columns={'person': 'Actor'})
 
         # Top 25 acteurs
         top_actors = df_exploded['Actor'].value_counts().head(25).index
@@ -249,7 +530,7 @@ class DataHandler:
 
         # On regroupe : nb de films + titres associés
         actor_movies = (
-            df_top.groupby('Actor')
+            df_top.groupby('Actor', observed=True)
             .agg(
                 Count=('title', 'count'),
                 Movies=('title', lambda x: ', '.join(sorted(set(x))))
@@ -261,31 +542,21 @@ class DataHandler:
         #nb_actor.columns = ['Actors', 'Number of Movies']
         return self.graph_maker.graph_actor(actor_movies)
 
+    @cached_chart()
     def director(self, key):
         if key == WATCHED:
-            nb_real = self.watched_df['director'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-        elif key == WATCHLIST:
-            nb_real = self.watchlist_df['director'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-        nb_real.columns = ['director', 'Number of Movies']
-        if key == WATCHED:
-            #nb_actor = self.watched_df['Actors'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-            df=self.watched_df.copy()
+            df=self.watched_df
         elif key == WATCHLIST:
             df=self.watchlist_df
-            #nb_actor = self.watchlist_df['Actors'].dropna().str.split(', ').explode().value_counts().head(25).reset_index()
-        df_exploded = (
-            df.dropna(subset=['director'])
-            .assign(Actor=df['director'].str.split(', '))
-            .explode('director')
-        )
+        df_exploded = self.bridge_rows(df, 'people', role='director').rename(columns={'person': 'director'})
 
-        # Top 25 acteurs
+        # Top 25 réalisateurs
         top_actors = df_exploded['director'].value_counts().head(25).index
         df_top = df_exploded[df_exploded['director'].isin(top_actors)]
 
         # On regroupe : nb de films + titres associés
         director_movies = (
-            df_top.groupby('director')
+            df_top.groupby('director', observed=True)
             .agg(
                 Count=('title', 'count'),
                 Movies=('title', lambda x: ', '.join(sorted(set(x))))
@@ -298,14 +569,10 @@ class DataHandler:
 
     def famous(self, key):
         if key == WATCHED:
-            movies_rating = self.watched_df.copy()
+            movies_rating = self.watched_df
         elif key == WATCHLIST:
-            movies_rating = self.watchlist_df.copy()
-        movies_rating['imdbVotes'] = movies_rating['imdbVotes'].replace("N/A", np.nan)
-        movies_rating['imdbVotes'] = movies_rating['imdbVotes'].replace("", np.nan)
+            movies_rating = self.watchlist_df
         movies_rating = movies_rating.dropna(subset=['imdbVotes'])
-        movies_rating['imdbVotes'] = movies_rating['imdbVotes'].astype(str).str.replace(',', '')
-        movies_rating['imdbVotes'] = movies_rating['imdbVotes'].astype(float)
         bottom_5_votes = movies_rating.sort_values(by='imdbVotes', ascending=True).head(10)
         bottom = bottom_5_votes[['title', 'imdbVotes']].reset_index(drop=True)
         top_5_votes = movies_rating.sort_values(by='imdbVotes', ascending=False).head(10)
@@ -314,6 +581,7 @@ class DataHandler:
 
 ### CINEPHILE
 
+    @cached_chart()
     def cinephile_graph(self, key):
 
            # Générer une colonne texte pour le hover
@@ -326,18 +594,16 @@ class DataHandler:
             return movies_text
 
         if key == WATCHED:
-            habit = self.watched_df.copy()
+            habit = self.watched_df
         elif key == WATCHLIST:
-            habit = self.watchlist_df.copy()
+            habit = self.watchlist_df
 
         result = compute_categories(self.quartile, habit)
-        result['Films'] = result['category'].apply(
-            lambda x: habit[habit['category'] == x]['title'].tolist()
-        )
         result['MoviesText'] = result['Films'].apply(make_movies_text)
 
         return self.graph_maker.cinephile_graph(result)
 
+    @cached_chart()
     def cinephile_div(self, key):
         if key== WATCHED:
             habit = self.watched_df.copy()
@@ -357,6 +623,7 @@ class DataHandler:
 
 ### DECADE
 
+    @cached_chart()
     def decade_graph(self, key):
         if key == WATCHED:
             df = self.watched_df.copy()
@@ -367,7 +634,8 @@ class DataHandler:
         df['year'] = df['year'].astype(int)
 
         # Calcul du bin de 5 ans
-        df['FiveYearBin'] = df['year'].apply(lambda y: f"{(y//5)*5}-{(y//5)*5+4}")
+        start = (df['year'] // 5) * 5
+        df['FiveYearBin'] = start.astype(str) + '-' + (start + 4).astype(str)
 
         # Groupby sur la tranche de 5 ans
         grouped = (
@@ -380,6 +648,7 @@ class DataHandler:
 
         return self.graph_maker.graph_decade(grouped)
     
+    @cached_chart()
     def decade_div(self, key):
         if key == WATCHED:
             df_decade = self.watched_df.copy()
@@ -395,6 +664,7 @@ class DataHandler:
 
 ### 
 
+    @cached_chart()
     def runtime_bar(self, key):
         if key == WATCHED:
             df = self.watched_df.copy()
@@ -409,36 +679,36 @@ class DataHandler:
         runtime_counts.columns = ['runtimeBin', 'Count']
         return self.graph_maker.graph_runtime_bar(df)
 
-    def mapW(self, key):
+    @cached_chart()
+    def country_rows(self, key):
+        """ Films de l'année sélectionnée (vus ou watchlist), une ligne par (film, pays) avec le code ISO :
+        calculé une fois par année, partagé par la carte et le clic sur un pays"""
         if key == WATCHED:
-            df_country = self.watched_df.copy()
+            df_country = self.watched_df
         elif key == WATCHLIST:
-            df_country = self.watchlist_df.copy()
-        df_country['country'] = df_country['country'].dropna().str.split(', ')
-        df_genres_exploded = df_country.explode('country')
-        genre_counts = df_genres_exploded['country'].value_counts().reset_index()
-        countries = {country.name: country.alpha_3 for country in pycountry.countries}
-        genre_counts['code'] = genre_counts['country'].map(countries)
-        return self.graph_maker.graph_mapW(genre_counts)
+            df_country = self.watchlist_df
+        return self.bridge_rows(df_country, 'countries', None)
+
+    @cached_chart()
+    def mapW(self, key):
+        df_countries_exploded = self.country_rows(key)
+        country_counts = df_countries_exploded['code'].value_counts().reset_index()
+        country_counts['country'] = country_counts['code'].astype(str).map(self.country_resolver.display_name)
+        return self.graph_maker.graph_mapW(country_counts)
 
     def mapW_div(self, country,key):
         """ Affiche 4 films d'un pays sélectionné sur la carte"""
         if key == WATCHED:
-            df_country = self.watched_df.copy()
             text = "you watched from "
         elif key == WATCHLIST:
-            df_country = self.watchlist_df.copy()
             text = "you want to watch from "
-        df_country['country'] = df_country['country'].dropna().str.split(', ')
-        df_genres_exploded = df_country.explode('country')
-        countries = {country.name: country.alpha_3 for country in pycountry.countries}
-        df_genres_exploded['code']=df_genres_exploded['country'].map(countries)
-        df_genres_exploded=df_genres_exploded[df_genres_exploded['code']==country]
-        if(len(df_genres_exploded)>4):
-            top_4 = df_genres_exploded.sample(4,replace=False)
+        rows = self.country_rows(key)
+        films = rows[rows['code'] == country]
+        if(len(films)>4):
+            top_4 = films.sample(4,replace=False)
         else:
-            top_4 = df_genres_exploded.sample(4,replace=True)
-        text = text+top_4.country.iloc[0]
+            top_4 = films.sample(4,replace=True)
+        text = text+self.country_resolver.display_name(country)
         return self.graph_maker.one_div_four_films(top_4, text)
     
     def diff_rating(self):
@@ -449,6 +719,7 @@ class DataHandler:
         sous_note = sous_note.head(10).reset_index(drop=True)
         return sur_note[['title','Rating','imdbRating','diff_rating']], sous_note[['title','Rating','imdbRating','diff_rating']]
     
+    @cached_chart()
     def diff_rating_test(self,key):
         match key:
             case "overrated":
@@ -462,6 +733,7 @@ class DataHandler:
         div= self.graph_maker.two_div_five_films(df.head(5), df.tail(5), text)
         return div
     
+    @cached_chart()
     def rating_director(self):
         # nb_real = self.rating_df['Director'].value_counts().head(25)
         # df_top_directors = self.rating_df[self.rating_df['Director'].isin(nb_real.index)]
@@ -495,6 +767,7 @@ class DataHandler:
         df_plot['MoviesText'] = df_plot['Movies'].apply(make_movies_text_split)
         return self.graph_maker.graph_rating_director(df_plot)
 
+    @cached_chart()
     def rating_actor(self):
         # nb_actor = self.rating_df['Actors'].dropna().str.split(', ').explode().value_counts().head(25)
         # top_actors = nb_actor.index
@@ -512,11 +785,7 @@ class DataHandler:
         # mean_rating_actor.columns = ['Actor', 'Moyenne_Rating']
 
         # df_actor_plot = pd.merge(nb_films_par_actor, mean_rating_actor, on='Actor')
-        df_exploded = (
-            self.rating_df.dropna(subset=['actors'])
-            .assign(Actor=self.rating_df['actors'].dropna().str.split(', '))
-            .explode('Actor')
-        )
+        df_exploded = self.bridge_rows(self.rating_df, 'people', ['title', 'Rating'], role='actor').rename(columns={'person': 'Actor'})
 
         # Top 25 acteurs (par nombre de films)
         top_actors = (
@@ -530,7 +799,7 @@ class DataHandler:
 
         # Agréger en une seule passe
         df_actor_plot = (
-            df_top_actors.groupby('Actor')
+            df_top_actors.groupby('Actor', observed=True)
             .agg(
                 Nb_Films=('title', 'count'),
                 Moyenne_Rating=('Rating', 'mean'),
@@ -542,34 +811,34 @@ class DataHandler:
         df_actor_plot['MoviesText'] = df_actor_plot['Movies'].apply(make_movies_text_split)
         return self.graph_maker.graph_rating_actor(df_actor_plot)
 
+    @cached_chart()
     def genre_rating(self):
-        rating_local=self.rating_df.copy()
-        rating_local['genre'] = rating_local['genre'].dropna().str.split(', ')
-        df_genres_exploded = rating_local.explode('genre')
+        df_genres_exploded = self.bridge_rows(self.rating_df, 'genres', ['Rating'])
         genre_counts = df_genres_exploded['genre'].value_counts().reset_index()
         genre_counts.columns = ['genre', 'Nombre de films']
 
-        mean_rating_genre = df_genres_exploded.groupby('genre')['Rating'].mean().reset_index()
+        mean_rating_genre = df_genres_exploded.groupby('genre', observed=True)['Rating'].mean().reset_index()
         mean_rating_genre.columns = ['genre', 'Moyenne_Rating']
 
         df_genre_plot = pd.merge(genre_counts, mean_rating_genre, on='genre')
         return self.graph_maker.graph_genre_rating(df_genre_plot)
 
+    @cached_chart()
     def comparaison_rating(self):
         # Groupby pour compter les valeurs dans 'Rating'
-        rate = self.rating_df.copy()
-        rate['imdbRating'] = pd.to_numeric(rate['imdbRating'], errors='coerce')
-        rate = rate.dropna(subset=['imdbRating'])
+        rate = self.rating_df.dropna(subset=['imdbRating']).copy()
         rate['imdbRating'] = (rate['imdbRating'] * 2).round() / 2
         rate = rate.groupby('imdbRating').size().reset_index(name='Number of movie')
         return self.graph_maker.graph_comparaison_rating(rate, self.rating_df)
 
+    @cached_chart()
     def generate_wordcloud(self):
-        if not self.corpus.empty:
-            stopwords = set(get_stop_words('fr')) | set(get_stop_words('en')) |set(get_stop_words('es'))
-            text = " ".join(self.corpus)
-            return self.graph_maker.graph_generate_wordcloud(text,stopwords)
+        """ Wordcloud des critiques de l'année, à partir des fréquences calculées à l'upload (build_review_index)"""
+        frequencies = self.review_index.get(self.year)
+        if frequencies:
+            return self.graph_maker.graph_generate_wordcloud(frequencies)
 
+    @cached_chart(per_year=False)
     def radar_graph(self):
 
         scores_names = ['Consommateur', 'Explorateur', 'Consensuel', 'Éclectique', 'Actif']
@@ -608,47 +877,14 @@ class DataHandler:
         fig = self.graph_maker.graph_radar(scores_values, scores_names_display, hover_texts)
         return fig
 
+    @cached_chart(per_year=False)
     def waffle(self, year):
-        df = self.watched_mg.copy()
-        # Grouper par Date et agréger les titres des films regardés ce jour-là
-        df_count = (
-            df.groupby('Date')
-            .agg(
-                count=('title', 'size'),
-                films_list=('title', lambda x: ', '.join(x))
-            )
-            .reset_index()
-        )
-        debut, fin = get_year_bounds(year)
-        debut = pd.to_datetime(debut)
-        fin = pd.to_datetime(fin)
-        df_count['Date'] = pd.to_datetime(df_count['Date'])
-        df_year = df_count[df_count['Date'].between(debut, fin)]
-        df_year.columns = ['date', 'count', 'films_list']
-
-        all_dates = pd.date_range(start=debut, end=fin, freq='D').normalize()
-
-        df_year_mg = pd.merge(
-            pd.DataFrame({'date': all_dates}),
-            df_year,
-            on='date',
-            how='left'
-        ).fillna({'count': 0, 'films_list': ''})
-        df_year_mg['count']=df_year_mg['count'].astype(int)
-
-
-        month_pos, weekdays, weeknumber = get_date_coordinates(
-        data=df_year_mg,
-        x='date'
-        )
-        return self.graph_maker.waffle(df_year_mg, month_pos, weekdays, weeknumber)
+        return self.graph_maker.waffle(self.diary_year(year))
 
     ### wrapped generator
      
     def mostCommonGenre(self):
-        df_copy = self.watched_df.copy()
-        df_copy['genre'] = df_copy['genre'].str.split(', ')
-        df_genres_exploded = df_copy.explode('genre')
+        df_genres_exploded = self.bridge_rows(self.watched_df, 'genres', [])
         counts = df_genres_exploded['genre'].value_counts()  # nombre d'occurences
         most_common = counts.idxmax()
         return most_common
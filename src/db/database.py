@@ -1,17 +1,42 @@
 import streamlit as st
 
-from sqlalchemy import create_engine, URL
+from sqlalchemy import create_engine, URL, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 
-DATABASE_URL = URL.create(
-    "postgresql+psycopg",
-    username=st.secrets['db_username'],
-    password=st.secrets['db_secret'],  # plain (unescaped) text
-    host=st.secrets['db_host'],
-    database=st.secrets['db_name'],
-    port=5432
-)
+def database_url():
+    """ URL de connexion, lue dans les secrets au premier accès à la base (et non à l'import du module)"""
+    return URL.create(
+        "postgresql+psycopg",
+        username=st.secrets['db_username'],
+        password=st.secrets['db_secret'],  # plain (unescaped) text
+        host=st.secrets['db_host'],
+        database=st.secrets['db_name'],
+        port=5432
+    )
+
+def text_column_to(table, column, sql_type, pattern, value):
+    """ Convertit une colonne texte en sql_type : les valeurs qui correspondent à pattern sont converties
+    avec l'expression value, les autres deviennent NULL. Ne fait rien si la colonne n'est plus du texte."""
+    return f"""
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = '{table}' AND column_name = '{column}') IN ('text', 'character varying') THEN
+            ALTER TABLE {table} ALTER COLUMN "{column}" TYPE {sql_type}
+                USING CASE WHEN "{column}" ~ '{pattern}' THEN CAST({value} AS {sql_type}) END;
+        END IF;
+    END $$
+    """
+
+# Colonnes ajoutées ou retypées après la création des tables (create_all ne modifie pas une table existante)
+MIGRATIONS = [
+    "ALTER TABLE errors ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP WITH TIME ZONE DEFAULT now()",
+    # valeurs OMDB stockées en nombres ('142 min' -> 142, '1,234' -> 1234, 'N/A' -> NULL)
+    text_column_to("movies", "runtime", "integer", "^[0-9][0-9,]*( min)?$", """replace(split_part("runtime", ' ', 1), ',', '')"""),
+    text_column_to("movies", "imdbVotes", "integer", "^[0-9][0-9,]*$", """replace("imdbVotes", ',', '')"""),
+    text_column_to("movies", "imdbRating", "double precision", "^[0-9]+(\\.[0-9]+)?$", '"imdbRating"'),
+]
 
 
 @st.cache_resource
@@ -22,7 +47,7 @@ def get_engine():
     """
 
     return create_engine(
-        DATABASE_URL,
+        database_url(),
         echo=False,
     )
 
@@ -33,6 +58,8 @@ def get_session_factory():
     Crée le sessionmaker une seule fois.
     """
 
+    init_db()
+
     return sessionmaker(
         bind=get_engine(),
         autoflush=False,
@@ -40,6 +67,23 @@ def get_session_factory():
     )
 
 
+@st.cache_resource
+def init_db():
+    """
+    Crée les tables qui n'existent pas encore et applique
+    les MIGRATIONS (une fois par process).
+    """
+
+    import src.db.models  # enregistre tous les modèles dans Base.metadata
+
+    engine = get_engine()
+    Base.metadata.create_all(engine, checkfirst=True)
+
+    with engine.begin() as connection:
+        for migration in MIGRATIONS:
+            connection.execute(text(migration))
+
+
 def get_session():
     """
     Crée une nouvelle session SQLAlchemy.
@@ -49,5 +93,28 @@ def get_session():
     return get_session_factory()()
 
 
+def copy_rows(session, table_name, columns, rows):
+    """
+    Envoie rows dans table_name avec COPY FROM STDIN,
+    dans la transaction en cours de la session.
+    Les valeurs doivent être des types Python (pas numpy).
+    """
+
+    from psycopg import sql  # psycopg n'est chargé qu'à la première écriture en base
+
+    statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table_name),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+    )
+
+    # connexion psycopg sous-jacente à la session
+    connection = session.connection().connection
+
+    with connection.cursor() as cursor:
+        with cursor.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
 class Base(DeclarativeBase):
     pass
@@ -1,5 +1,7 @@
 from src.db.models.movie import Movie
 from src.db.models.user_stats import UserStats
 from src.db.models.error import Error
+from src.db.models.api_key_usage import ApiKeyUsage
+from src.db.models.movie_quantiles import MovieQuantiles
 
-__all__ = ["Movie", "UserStats","Error"]
\ No newline at end of file
+__all__ = ["Movie", "UserStats","Error","ApiKeyUsage","MovieQuantiles"]
\ No newline at end of file
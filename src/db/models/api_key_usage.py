@@ -0,0 +1,26 @@
+from datetime import date
+
+from sqlalchemy import String, Integer, Date
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+class ApiKeyUsage(Base):
+    __tablename__ = "api_key_usage"
+
+    # Empreinte de la clé OMDB (on ne stocke jamais la clé elle-même)
+    key_id: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True
+    )
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True
+    )
+
+    nb: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0
+    )
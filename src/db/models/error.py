@@ -1,4 +1,6 @@
-from sqlalchemy import String, Integer
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, func
 from sqlalchemy.orm import  Mapped, mapped_column
 
 from src.db.database import Base
@@ -21,4 +23,11 @@ class Error(Base):
         Integer,
         nullable=False,
         default=1
+    )
+
+    # Date du dernier échec, sert à faire expirer le cache négatif
+    last_seen: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        server_default=func.now()
     )
\ No newline at end of file
@@ -29,8 +29,9 @@ class Movie(Base):
         nullable=True
     )
 
-    runtime: Mapped[Optional[str]] = mapped_column(
-        String(50),
+    # durée en minutes ('142 min' dans la réponse OMDB)
+    runtime: Mapped[Optional[int]] = mapped_column(
+        Integer,
         nullable=True
     )
 
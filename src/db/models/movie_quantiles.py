@@ -0,0 +1,37 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlalchemy import String, Float, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+class MovieQuantiles(Base):
+    __tablename__ = "movie_quantiles"
+
+    # Colonne de movies sur laquelle portent les quantiles (ex : "imdbVotes")
+    name: Mapped[str] = mapped_column(
+        String(50),
+        primary_key=True
+    )
+
+    # Quantiles 5%, 20% et 50%
+    q1: Mapped[Optional[float]] = mapped_column(
+        Float,
+        nullable=True
+    )
+
+    q2: Mapped[Optional[float]] = mapped_column(
+        Float,
+        nullable=True
+    )
+
+    q3: Mapped[Optional[float]] = mapped_column(
+        Float,
+        nullable=True
+    )
+
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False
+    )
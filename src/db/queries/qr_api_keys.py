@@ -0,0 +1,64 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from src.db.database import get_session
+from src.db.models import ApiKeyUsage
+
+
+def get_key_usage(day, key_ids):
+    """
+    Renvoie le nombre de requêtes déjà faites ce jour-là
+    pour chaque clé : {key_id: nb}
+    """
+
+    session = get_session()
+
+    try:
+
+        stmt = (
+            select(ApiKeyUsage.key_id, ApiKeyUsage.nb)
+            .where(
+                ApiKeyUsage.day == day,
+                ApiKeyUsage.key_id.in_(key_ids)
+            )
+        )
+
+        return {
+            key_id: nb
+            for key_id, nb in session.execute(stmt)
+        }
+
+    finally:
+        session.close()
+
+
+def add_key_usage(records):
+    """
+    Ajoute les requêtes faites depuis le dernier envoi
+    aux compteurs du jour.
+    """
+
+    session = get_session()
+
+    try:
+
+        stmt = insert(ApiKeyUsage).values(records)
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                "key_id",
+                "day"
+            ],
+            set_={
+                "nb": ApiKeyUsage.nb + stmt.excluded.nb
+            }
+        )
+
+        session.execute(stmt)
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
@@ -1,3 +1,4 @@
+from sqlalchemy import select, func
 from sqlalchemy.dialects.postgresql import insert
 from src.db.database import get_session
 from src.db.models import Error
@@ -17,7 +18,8 @@ def add_error(records):
                 "year"
             ],
             set_={
-                "nb": Error.nb + stmt.excluded.nb
+                "nb": Error.nb + stmt.excluded.nb,
+                "last_seen": func.now()
             }
         )
 
@@ -29,4 +31,30 @@ def add_error(records):
         raise
 
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def get_errors(min_nb, since):
+    """
+    Renvoie les couples (title, year) qui ont échoué
+    au moins min_nb fois, dont le dernier échec date d'après since.
+    """
+
+    session = get_session()
+
+    try:
+
+        stmt = (
+            select(Error.title, Error.year)
+            .where(
+                Error.nb >= min_nb,
+                Error.last_seen >= since
+            )
+        )
+
+        return [
+            (title, year)
+            for title, year in session.execute(stmt)
+        ]
+
+    finally:
+        session.close()
@@ -1,9 +1,9 @@
-from sqlalchemy import select, tuple_,func
-from src.db.database import get_session
-from src.db.models import Movie
+import json
+from sqlalchemy import select, func, and_, text, literal, table, column, Table, MetaData, Column, String, Integer, JSON
+from src.db.database import get_session, copy_rows
+from src.db.models import Movie, MovieQuantiles
 import pandas as pd
 from sqlalchemy.dialects.postgresql import insert
-BATCH_SIZE = 100
 
 def get_movies(limit=100):
 
@@ -22,111 +22,141 @@ def get_movies(limit=100):
         session.close()
 
 
+# Table temporaire qui reçoit les couples Title / Year d'un upload.
+# Elle disparaît à la fin de la transaction (rollback à la fermeture de la session).
+MOVIE_KEYS = Table(
+    "movie_keys",
+    MetaData(),
+    Column("title", String(500)),
+    Column("year", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
 def get_all_movies(df):
     """
-    Sépare le DataFrame entre :
-    - les films déjà présents en base
-    - les films absents de la base
+    Sépare les couples Name / Year de df entre :
+    - les films déjà présents en base (lignes de movies)
+    - les couples absents de la base (colonnes title / year)
 
-    Le DataFrame doit contenir :
-    - Title
-    - Year
+    Les couples sont chargés par COPY dans une table temporaire
+    et la jointure est faite côté PostgreSQL.
     """
     # On récupère uniquement les couples Title / Year
-    movie_keys = list(
-        df[["Name", "Year"]]
-        .drop_duplicates()
-        .itertuples(index=False, name=None)
+    keys = df[["Name", "Year"]].dropna().drop_duplicates()
+    movie_keys = zip(
+        keys["Name"].tolist(),
+        keys["Year"].astype(int).tolist()
     )
     session = get_session()
 
     try:
+        MOVIE_KEYS.create(session.connection())
+        copy_rows(session, MOVIE_KEYS.name, ["title", "year"], movie_keys)
+
         stmt = (
-            select(Movie)
-            .where(
-                tuple_(
-                    Movie.title,
-                    Movie.year
-                ).in_(movie_keys)
+            select(
+                MOVIE_KEYS.c.title.label("key_title"),
+                MOVIE_KEYS.c.year.label("key_year"),
+                *Movie.__table__.columns
+            )
+            .select_from(
+                MOVIE_KEYS.outerjoin(
+                    Movie,
+                    and_(
+                        Movie.title == MOVIE_KEYS.c.title,
+                        Movie.year == MOVIE_KEYS.c.year
+                    )
+                )
             )
         )
 
         result = session.execute(stmt)
-
-        df_result = pd.DataFrame([
-        {
-            column.name: getattr(movie, column.name)
-            for column in Movie.__table__.columns
-        }
-        for movie in result.scalars()
-        ])
+        df_join = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
 
     finally:
         session.close()
 
-    return df_result
+    found = df_join["title"].notna()
+    df_result = df_join.loc[found, [column.name for column in Movie.__table__.columns]].reset_index(drop=True)
+    df_missing = (
+        df_join.loc[~found, ["key_title", "key_year"]]
+        .rename(columns={"key_title": "title", "key_year": "year"})
+        .reset_index(drop=True)
+    )
+
+    return df_result, df_missing
 
-def clean_value(value):
+def to_copy_records(df):
     """
-    Convertit les NaN/NaT Pandas en None.
-    Conserve les listes et dictionnaires.
+    Prépare df pour COPY :
+    - colonnes entières du modèle en Int64 (COPY refuse "2022.0" pour un integer)
+    - colonnes JSON sérialisées
+    - NaN/NaT/NA remplacés par None (NULL), en une passe
     """
+    records = df.copy()
+
+    for model_column in Movie.__table__.columns:
+        name = model_column.name
+        if name not in records.columns:
+            continue
+        if isinstance(model_column.type, Integer):
+            records[name] = pd.to_numeric(
+                records[name],
+                errors="coerce"
+            ).round().astype("Int64")
+        elif isinstance(model_column.type, JSON):
+            records[name] = records[name].map(
+                json.dumps,
+                na_action="ignore"
+            )
 
-    if value is None:
-        return None
-
-    if isinstance(value, (list, dict)):
-        return value
-
-    try:
-        if pd.isna(value):
-            return None
-    except (TypeError, ValueError):
-        pass
-
-    return value
+    records = records.astype(object)
+    return records.where(records.notna(), None)
 
 def save_movies(df):
+    """
+    Insère les films de df dans movies :
+    COPY dans une table temporaire puis un seul
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Renvoie le nombre de films réellement insérés.
+    """
+    columns = list(df.columns)
+    records = to_copy_records(df)
+    staging = table("movies_staging", *[column(name) for name in columns])
+
     session = get_session()
-    inserted_count = 0
 
     try:
+        session.execute(text(
+            "CREATE TEMPORARY TABLE movies_staging "
+            "(LIKE movies INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        copy_rows(
+            session,
+            "movies_staging",
+            columns,
+            records.itertuples(index=False, name=None)
+        )
 
-        for start in range(
-            0,
-            len(df),
-            BATCH_SIZE
-        ):
-            batch = df[
-                start:start + BATCH_SIZE
-            ]
-
-            records = batch.to_dict(
-                orient="records"
+        stmt = (
+            insert(Movie)
+            .from_select(
+                columns,
+                select(*staging.c)
+                .distinct(staging.c.title, staging.c.year)
             )
-
-            # Nettoyage des valeurs
-            records = [
-                {
-                    key: clean_value(value)
-                    for key, value in record.items()
-                }
-                for record in records
-            ]
-
-            stmt = (
-                insert(Movie)
-                .values(records)
-                .on_conflict_do_nothing(
-                    index_elements=[
-                        "title",
-                        "year"
-                    ]
-                )
+            .on_conflict_do_nothing(
+                index_elements=[
+                    "title",
+                    "year"
+                ]
             )
-            result = session.execute(stmt)
-            inserted_count += result.rowcount
-            session.commit()
+        )
+        result = session.execute(stmt)
+        inserted_count = result.rowcount
+        session.commit()
     except Exception:
         session.rollback()
         raise
@@ -135,10 +165,36 @@ def save_movies(df):
 
     return inserted_count
 
-def compute_quantiles():
+def get_stored_quantiles():
+    """
+    Renvoie les quantiles de imdbVotes enregistrés
+    dans movie_quantiles (q1, q2, q3, computed_at),
+    ou None s'ils n'ont jamais été calculés.
     """
-    Calcule les quantiles 5%, 20% et 50% de imdbVotes
-    directement dans PostgreSQL.
+
+    session = get_session()
+
+    try:
+
+        stmt = (
+            select(
+                MovieQuantiles.q1,
+                MovieQuantiles.q2,
+                MovieQuantiles.q3,
+                MovieQuantiles.computed_at
+            )
+            .where(MovieQuantiles.name == "imdbVotes")
+        )
+
+        return session.execute(stmt).one_or_none()
+
+    finally:
+        session.close()
+
+def refresh_quantiles():
+    """
+    Recalcule les quantiles 5%, 20% et 50% de imdbVotes
+    et les enregistre dans movie_quantiles, en une requête.
 
     Retourne :
         q1, q2, q3
@@ -148,27 +204,46 @@ def compute_quantiles():
 
     try:
 
-        stmt = select(
+        computed = select(
+            literal("imdbVotes"),
             func.percentile_cont(0.05)
-                .within_group(Movie.imdbVotes).label("q1"),
-
+                .within_group(Movie.imdbVotes),
             func.percentile_cont(0.20)
-                .within_group(Movie.imdbVotes).label("q2"),
-
+                .within_group(Movie.imdbVotes),
             func.percentile_cont(0.50)
-                .within_group(Movie.imdbVotes).label("q3"),
+                .within_group(Movie.imdbVotes),
+            func.now(),
         ).where(
             Movie.imdbVotes.is_not(None)
         )
 
+        stmt = insert(MovieQuantiles).from_select(
+            ["name", "q1", "q2", "q3", "computed_at"],
+            computed
+        )
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={
+                "q1": stmt.excluded.q1,
+                "q2": stmt.excluded.q2,
+                "q3": stmt.excluded.q3,
+                "computed_at": stmt.excluded.computed_at,
+            }
+        ).returning(
+            MovieQuantiles.q1,
+            MovieQuantiles.q2,
+            MovieQuantiles.q3
+        )
+
         result = session.execute(stmt).one()
+        session.commit()
 
-        q1 = result.q1
-        q2 = result.q2
-        q3 = result.q3
+        return result.q1, result.q2, result.q3
 
-        return q1, q2, q3
+    except Exception:
+        session.rollback()
+        raise
 
     finally:
         session.close()
-
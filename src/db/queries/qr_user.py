@@ -1,7 +1,7 @@
 import json
 import pandas as pd
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 from src.db.models.user_stats import UserStats
 from src.db.database import get_session
 
@@ -56,6 +56,85 @@ def get_global_stats():
     finally:
         session.close()
 
+def get_radar_ranks(markers):
+    """
+    Classe les indicateurs numériques d'un profil dans la population
+    de user_stats, directement dans PostgreSQL (aucune ligne n'est rapatriée).
+    Le score Éclectique est calculé à part (GenreDistanceModel).
+
+    Retourne pour chaque score : (n, n_le, n_eq)
+    - n    : nombre de profils
+    - n_le : profils dont l'indicateur est <= à celui du profil
+    - n_eq : profils dont l'indicateur est égal à celui du profil
+    """
+
+    session = get_session()
+
+    try:
+        columns = {
+            "Consommateur": (UserStats.nb_films_vus, int(markers["nb_films_vus"])),
+            "Explorateur": (UserStats.ratio_peu_vus, float(markers["ratio_peu_vus"])),
+            "Consensuel": (func.abs(UserStats.moyenne_diff_rating), abs(float(markers["moyenne_diff_rating"]))),
+            "Actif": (UserStats.nb_interactions, int(markers["nb_interactions"])),
+        }
+
+        counts = [func.count().label("n")]
+        for score, (column, marker) in columns.items():
+            counts.append(func.count().filter(column <= marker).label(f"{score}_le"))
+            counts.append(func.count().filter(column == marker).label(f"{score}_eq"))
+
+        result = session.execute(select(*counts)).mappings().one()
+
+        return {
+            score: (result["n"], result[f"{score}_le"], result[f"{score}_eq"])
+            for score in columns
+        }
+
+    finally:
+        session.close()
+
+def get_genre_ratios():
+    """
+    Renvoie {id: ratio_par_genre} pour tous les profils
+    (seule la colonne JSONB utile au score Éclectique est lue).
+    """
+
+    session = get_session()
+
+    try:
+
+        stmt = select(UserStats.id, UserStats.ratio_par_genre)
+
+        return {
+            profile_id: ratios or {}
+            for profile_id, ratios in session.execute(stmt)
+        }
+
+    finally:
+        session.close()
+
+def get_user_stats_version():
+    """
+    Empreinte bon marché de user_stats : (nombre de profils, somme des passages).
+    Elle change à chaque add_profile_to_stats, quel que soit le process.
+    """
+
+    session = get_session()
+
+    try:
+
+        stmt = select(
+            func.count(),
+            func.coalesce(func.sum(UserStats.nb_passages), 0)
+        )
+
+        count, passages = session.execute(stmt).one()
+
+        return int(count), int(passages)
+
+    finally:
+        session.close()
+
 def clean_genre(value):
     if isinstance(value, str):
 
@@ -135,4 +214,37 @@ def add_profile_to_stats(profile, radar_stats):
         raise
 
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def update_user_scores(scores):
+    """
+    Met à jour les cinq scores de plusieurs profils
+    en un seul UPDATE groupé (par clé primaire).
+    """
+
+    session = get_session()
+
+    try:
+
+        records = [
+            {
+                "id": row["id"],
+                "consommateur": int(row["Consommateur"]),
+                "explorateur": int(row["Explorateur"]),
+                "consensuel": int(row["Consensuel"]),
+                "eclectique": int(row["Éclectique"]),
+                "actif": int(row["Actif"]),
+            }
+            for row in scores.to_dict(orient="records")
+        ]
+
+        if records:
+            session.execute(update(UserStats), records)
+            session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
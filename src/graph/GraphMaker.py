@@ -1,13 +1,12 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import src.utils.utils as utils
 from typing import Any, List
-from wordcloud import WordCloud
 import random
+import io
 from plotly.subplots import make_subplots
 from src.utils.constants import PALETTE
 
@@ -57,6 +56,41 @@ class GraphMaker:
 
         return div
 
+    def swarm_traces(self, df, column, bins, customdata, hovertemplate):
+        """ Points d'un swarmplot au-dessus des barres de bins, calculés en une passe :
+        y empile les films d'un bin (cumcount + 0.5, soit toute la hauteur de la barre), x = position du bin + jitter.
+        Les couleurs alternent d'un bin à l'autre : une trace par couleur plutôt qu'une par bin."""
+        bin_colors = [PALETTE[k] for k in ['orange', 'vert', 'bleu']]
+        positions = pd.Categorical(df[column], categories=bins).codes
+        points = df[positions >= 0]
+        positions = positions[positions >= 0]
+
+        y = points.groupby(column, observed=True).cumcount().to_numpy() + 0.5
+        # Jitter horizontal centré sur la barre
+        x = positions + np.random.uniform(-0.35, 0.35, len(points))
+        data = points[customdata].to_numpy()
+
+        traces = []
+        for i, color in enumerate(bin_colors):
+            mask = positions % len(bin_colors) == i
+            if not mask.any():
+                continue
+            traces.append(go.Scatter(
+                x=x[mask],
+                y=y[mask],
+                mode='markers',
+                marker=dict(
+                    color=color,
+                    size=9,
+                    opacity=0.85,
+                    line=dict(width=0)
+                ),
+                customdata=data[mask],
+                hovertemplate=hovertemplate,
+                showlegend=False
+            ))
+        return traces
+
     def graph_genre(self, df) :
 
         genre_counts = df['genre'].value_counts().sort_index().reset_index()
@@ -80,37 +114,10 @@ class GraphMaker:
             hoverinfo='skip'
         ))
 
-        for i, bin_label in enumerate(bins):
-            sub_df = df[df['genre'] == bin_label]
-            if sub_df.empty:
-                continue
-
-            n_points = sub_df.shape[0]
-            count = df[df['genre'] == bin_label]['genre'].count()
-            # Étalement vertical des points sur toute la hauteur de la barre
-            if n_points == 1:
-                y = [count/2]
-            else:
-                y = np.linspace(0.5, count-0.5, n_points)
-            # Jitter horizontal centré sur la barre
-            x = bin_pos[i] + np.random.uniform(-0.35, 0.35, n_points)
-
-            palette_keys = ['orange', 'vert', 'bleu']
-            BIN_COLORS = [PALETTE[k] for k in palette_keys]
-            fig.add_trace(go.Scatter(
-                x=x,
-                y=y,
-                mode='markers',
-                marker=dict(
-                    color=BIN_COLORS[i % len(BIN_COLORS)],
-                    size=9,
-                    opacity=0.85,
-                    line=dict(width=0)
-                ),
-                customdata=sub_df[['title', 'year']],
-                hovertemplate='<b>%{customdata[0]} (%{customdata[1]})</b><extra></extra>',
-                showlegend=False
-            ))
+        fig.add_traces(self.swarm_traces(
+            df, 'genre', bins, ['title', 'year'],
+            '<b>%{customdata[0]} (%{customdata[1]})</b><extra></extra>'
+        ))
 
         fig.update_layout(
             xaxis_title='',
@@ -526,13 +533,15 @@ class GraphMaker:
     def random_color_func(self,word, font_size, position, orientation, random_state=None, **kwargs):
         return random.choice([PALETTE['orange'], PALETTE['vert'], PALETTE['bleu']])
 
-    def graph_generate_wordcloud(self, text, stopword):
-        wordcloud = WordCloud(stopwords=stopword,width=800, height=400, background_color="#0e1117",max_words=120,color_func=self.random_color_func)
-        wc=wordcloud.generate(text)
-        fig, ax = plt.subplots(figsize = (20, 10),facecolor='k')
-        ax.imshow(wc, interpolation = 'bilinear')
-        plt.axis('off')
-        return fig
+    def graph_generate_wordcloud(self, frequencies):
+        """ frequencies : {mot: nombre}, mots vides déjà retirés.
+        Renvoie l'image en PNG (bytes), directement à la taille du nuage : à afficher avec st.image."""
+        from wordcloud import WordCloud  # import lourd (matplotlib), seulement pour l'onglet Rating
+        wordcloud = WordCloud(width=800, height=400, background_color="#0e1117",max_words=120,color_func=self.random_color_func)
+        wc=wordcloud.generate_from_frequencies(frequencies)
+        buffer = io.BytesIO()
+        wc.to_image().save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
 
     def graph_runtime_bar(self, df):
        # Comptage par bin pour les barres de fond
@@ -555,38 +564,11 @@ class GraphMaker:
             hoverinfo='skip'
         ))
 
-        # Swarmplot pour chaque bin
-        for i, bin_label in enumerate(bins):
-            sub_df = df[df['runtimeBin'] == bin_label]
-            if sub_df.empty:
-                continue
-
-            n_points = sub_df.shape[0]
-            count = runtime_counts.loc[i, 'Count']
-            # Étalement vertical des points sur toute la hauteur de la barre
-            if n_points == 1:
-                y = [count/2]
-            else:
-                y = np.linspace(0.5, count-0.5, n_points)
-            # Jitter horizontal centré sur la barre
-            x = bin_pos[i] + np.random.uniform(-0.35, 0.35, n_points)
-
-            palette_keys = ['orange', 'vert', 'bleu']
-            BIN_COLORS = [PALETTE[k] for k in palette_keys]
-            fig.add_trace(go.Scatter(
-                x=x,
-                y=y,
-                mode='markers',
-                marker=dict(
-                    color=BIN_COLORS[i % len(BIN_COLORS)],
-                    size=9,
-                    opacity=0.85,
-                    line=dict(width=0)
-                ),
-                customdata=sub_df[['title', 'year','runtime']],
-                hovertemplate='<b>%{customdata[0]} (%{customdata[1]})</b><br>%{customdata[2]} min<extra></extra>',
-                showlegend=False
-            ))
+        # Swarmplot sur tous les bins
+        fig.add_traces(self.swarm_traces(
+            df, 'runtimeBin', bins, ['title', 'year', 'runtime'],
+            '<b>%{customdata[0]} (%{customdata[1]})</b><br>%{customdata[2]} min<extra></extra>'
+        ))
 
         fig.update_layout(
             xaxis_title='Runtime (minutes)',
@@ -840,10 +822,11 @@ class GraphMaker:
     
     #TODO voir les couleurs de la palette
     #see https://github.com/brunorosilva/plotly-calplot/tree/main for more details (about the waffle plot)
-    def waffle(self,df,month_pos,weekdays,weeknumber):
+    def waffle(self, grid):
+        """ Calendrier d'une année à partir d'une tranche du journal (DataHandler.diary_year)"""
         GRAY = "#202831"
         GREEN=PALETTE['vert']
-        z_values = df['count']
+        z_values = grid['count']
         if np.all(z_values == 0):
             colorscale = [[0, GRAY], [1, GRAY]]
             zmax = 1  
@@ -857,16 +840,13 @@ class GraphMaker:
                 colorscale.append([value, green_rgba])
             zmax = None  
         month_names = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        month_pos = np.linspace(1.5, 50, 12)
         layout = self.decide_layout("", month_names, month_pos)
 
-        df['films_list'] = df['films_list'].apply(
-            lambda x: '<br> • ' + x.replace(',', '<br> •') if x else ''
-        )
-
         fig = go.Heatmap(
-            x=weeknumber,
-            y=weekdays,
-            z=df['count'],
+            x=grid['week'],
+            y=grid['weekday'],
+            z=z_values,
             colorbar=dict(title='Compteur'),
             xgap=1.5,
             ygap=1.5,
@@ -880,15 +860,17 @@ class GraphMaker:
             "<b>Films watched:</b> %{z}"
             "%{customdata[1]}<extra></extra>"
             ),
-            customdata=np.stack((df['date'].astype(str), df['films_list']), axis=-1),
+            customdata=np.stack((grid['label'], grid['films_list']), axis=-1),
         )
+        # seuls les premiers jours du mois portent une ligne de séparation
+        month_starts = grid['date'].day == 1
         fig=self.create_month_lines(
             cplt=[fig],
             month_lines_color= PALETTE['bleu'],
             month_lines_width=3,
-            data=df['date'],
-            weekdays_in_year=weekdays,
-            weeknumber_of_dates=weeknumber
+            data=grid['date'][month_starts],
+            weekdays_in_year=grid['weekday'][month_starts],
+            weeknumber_of_dates=grid['week'][month_starts]
         )
         figTest = make_subplots(rows=1, cols=1)
         fig = self.update_plot_with_current_layout(
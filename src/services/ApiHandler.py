@@ -1,46 +1,66 @@
 # modules externes
-import streamlit as st
 import requests
-import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # modules internes
 from src.db.queries.qr_user import *
 from src.services.radar_graph import *
 from src.utils.utils import *
 from src.db.queries.qr_movie import *
+from src.services.key_scheduler import get_key_scheduler
+from src.utils.constants import OMDB_TIMEOUT, OMDB_POOL_SIZE, OMDB_MAX_RETRIES, OMDB_BACKOFF_FACTOR, OMDB_BACKOFF_JITTER, OMDB_RETRY_STATUS
 
 class ApiHandler:
     """ Classe pour gérer les interactions avec l'API OMDB"""
 
-    def __init__(self):
+    def __init__(self, timeout=OMDB_TIMEOUT, pool_size=OMDB_POOL_SIZE, max_retries=OMDB_MAX_RETRIES):
+        self.timeout = timeout
         self.setup_omdb_api()
+        self.session = self.create_session(pool_size, max_retries)
 
     def setup_omdb_api(self):
-        """ Configure l'API OMDB avec la clé API"""
+        """ Configure l'API OMDB : les clés sont distribuées par le planificateur partagé"""
         self.base_url = 'http://www.omdbapi.com/'
-        self.api_key_array = st.secrets['API_KEY_ARRAY']
-        self.api_key_index = 0
+        self.key_scheduler = get_key_scheduler()
 
-    def switch_api_key(self):
-        """ Change la clé API utilisée pour les requêtes OMDB"""
-        self.api_key_index += 1
-        if self.api_key_index >= len(self.api_key_array):
-            logging.basicConfig(level=logging.INFO)
-            logging.info("no more API keys")
-            raise Exception("All API keys have been used up.")
+    def create_session(self, pool_size, max_retries):
+        """ Crée la session HTTP partagée par toutes les requêtes OMDB.
+        Les connexions sont gardées ouvertes (keep-alive) dans un pool de pool_size connexions.
+        Les erreurs de connexion et les 5xx sont retentées avec un backoff exponentiel + jitter ;
+        si le serveur répond toujours en erreur, la dernière réponse est renvoyée telle quelle (le 503 reste visible pour get_films)."""
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=OMDB_BACKOFF_FACTOR,
+            backoff_jitter=OMDB_BACKOFF_JITTER,
+            status_forcelist=OMDB_RETRY_STATUS,
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def get_movie_data_by_title(self, title, year):
         """ Récupère les données d'un film par son titre et son année via l'API OMDB.
-        Elle est utilisée quand le film n'est pas dans la feuille de calcul. Peut changer la clé API si la limite de requêtes est atteinte."""
+        Elle est utilisée quand le film n'est pas dans la base. Si une clé atteint sa limite, la requête repart sur une autre clé."""
         year = np.int64(year)
-        requestReponse = requests.get(self.base_url, params={'apikey': self.api_key_array[self.api_key_index], 't': title, 'y': year})
-        response = requestReponse.json()
-        status_code = requestReponse.status_code
-        if response.get('Error') is not None:
-            # sentry_sdk.capture_message(f"Movie not found: {row.to_dict()}")
-            # print(response.get('Error'))
-            if response['Error'] == "Request limit reached!":
-                self.switch_api_key()
-                response,status_code = self.get_movie_data_by_title(title, year)
-        return response,status_code
-    
\ No newline at end of file
+        while True:
+            key_id, api_key = self.key_scheduler.acquire()
+            requestReponse = self.session.get(self.base_url, params={'apikey': api_key, 't': title, 'y': year}, timeout=self.timeout)
+            status_code = requestReponse.status_code
+            try:
+                response = requestReponse.json()
+            except ValueError:
+                # les pages d'erreur 5xx ne sont pas du JSON
+                response = {'Error': f"HTTP {status_code}"}
+            if response.get('Error') == "Request limit reached!":
+                self.key_scheduler.mark_exhausted(key_id)
+                continue
+            return response,status_code
+
+    def flush_key_usage(self):
+        """ Sauvegarde en base la consommation des clés"""
+        self.key_scheduler.flush()
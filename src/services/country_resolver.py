@@ -0,0 +1,67 @@
+# modules externes
+import streamlit as st
+
+# Noms de pays renvoyés par OMDB qui ne sont pas des noms pycountry.
+# Les pays qui n'existent plus sont rattachés à leur principal successeur (la carte n'affiche que les pays actuels).
+COUNTRY_ALIASES = {
+    "UK": "GBR",
+    "USA": "USA",
+    "West Germany": "DEU",
+    "East Germany": "DEU",
+    "Soviet Union": "RUS",
+    "Russia": "RUS",
+    "Czechoslovakia": "CZE",
+    "Yugoslavia": "SRB",
+    "Federal Republic of Yugoslavia": "SRB",
+    "Serbia and Montenegro": "SRB",
+    "Korea": "KOR",
+    "Turkey": "TUR",
+    "Palestine": "PSE",
+    "Occupied Palestinian Territory": "PSE",
+    "Ivory Coast": "CIV",
+    "Macedonia": "MKD",
+    "Democratic Republic of the Congo": "COD",
+    "The Democratic Republic Of Congo": "COD",
+    "Zaire": "COD",
+    "Burma": "MMR",
+    "Brunei": "BRN",
+    "Cape Verde": "CPV",
+    "Swaziland": "SWZ",
+    "Isle Of Man": "IMN",
+    "Vatican": "VAT",
+    "Micronesia": "FSM",
+    "Netherlands Antilles": "NLD",
+}
+
+
+class CountryResolver:
+    """ Nom de pays OMDB -> code ISO alpha-3 (celui de la carte Plotly), et code -> nom affiché.
+    Construit une fois par process à partir de pycountry (nom, nom courant, nom officiel) et de COUNTRY_ALIASES."""
+
+    def __init__(self, countries, aliases):
+        self.codes = {}
+        self.names = {}
+        for country in countries:
+            self.names[country.alpha_3] = getattr(country, 'common_name', country.name)
+            for name in (country.name, getattr(country, 'common_name', None), getattr(country, 'official_name', None)):
+                if name:
+                    self.codes[name] = country.alpha_3
+        self.codes.update(aliases)
+
+    def code(self, name):
+        return self.codes.get(name)
+
+    def codes_of(self, names):
+        """ Codes d'une Series de noms (NaN si le nom est inconnu)"""
+        return names.map(self.codes)
+
+    def display_name(self, code):
+        return self.names.get(code, code)
+
+
+@st.cache_resource
+def get_country_resolver():
+    """ Un seul résolveur par process, partagé par toutes les sessions Streamlit.
+    pycountry n'est importé qu'ici : seules les cartes en ont besoin."""
+    import pycountry
+    return CountryResolver(pycountry.countries, COUNTRY_ALIASES)
@@ -1,7 +1,21 @@
+import streamlit as st
 import pandas as pd
+from datetime import datetime, timedelta, timezone
 from src.db.queries.qr_errors import *
+from src.utils.constants import NEGATIVE_CACHE_MIN_NB, NEGATIVE_CACHE_TTL_DAYS, NEGATIVE_CACHE_REFRESH
+
+
+@st.cache_data(ttl=NEGATIVE_CACHE_REFRESH)
+def load_known_errors(min_nb, ttl_days):
+    """ Charge depuis la table errors les (title, year) à ne plus demander à OMDB"""
+    since = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+    return set(get_errors(min_nb, since))
+
 
 class ErrorService:
+    def get_known_errors(self):
+        return load_known_errors(NEGATIVE_CACHE_MIN_NB, NEGATIVE_CACHE_TTL_DAYS)
+
     def add_error_db(self,df):
         if df.empty:
                 return
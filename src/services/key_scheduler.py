@@ -0,0 +1,120 @@
+# modules externes
+import streamlit as st
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+# modules internes
+from src.db.queries.qr_api_keys import get_key_usage, add_key_usage
+from src.utils.constants import OMDB_DAILY_QUOTA, OMDB_RATE_PER_SECOND, OMDB_BURST
+
+
+class TokenBucket:
+    """ Limiteur de débit : rate jetons par seconde, au plus capacity jetons en réserve"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Prend un jeton, en attendant qu'il y en ait un de disponible"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class KeysExhaustedError(Exception):
+    """ Toutes les clés OMDB ont atteint leur quota du jour"""
+
+
+class KeyScheduler:
+    """ Répartit les requêtes OMDB entre les clés de API_KEY_ARRAY.
+    Chaque requête part sur la clé qui a le plus de quota restant pour la journée (UTC).
+    Les compteurs sont stockés en base pour survivre aux reruns et aux redémarrages."""
+
+    def __init__(self, api_keys, daily_quota, bucket):
+        self.api_keys = list(api_keys)
+        self.key_ids = [hashlib.sha256(key.encode()).hexdigest()[:16] for key in self.api_keys]
+        self.daily_quota = daily_quota
+        self.bucket = bucket
+        self.lock = threading.Lock()
+        self.pending = dict.fromkeys(self.key_ids, 0)
+        self.day = self.today()
+        self.used = self.load_usage()
+
+    def today(self):
+        return datetime.now(timezone.utc).date()
+
+    def load_usage(self):
+        """ Compteurs du jour en base + requêtes pas encore écrites"""
+        usage = get_key_usage(self.day, self.key_ids)
+        return {key_id: usage.get(key_id, 0) + self.pending[key_id] for key_id in self.key_ids}
+
+    def acquire(self):
+        """ Renvoie (key_id, clé) pour la prochaine requête. Lève KeysExhaustedError si toutes les clés sont épuisées.
+        Le quota est vérifié (et la requête réservée) avant d'attendre un jeton : une fois les clés vides,
+        l'échec est immédiat au lieu de passer par le limiteur de débit."""
+        with self.lock:
+            if self.today() != self.day:
+                # nouveau jour : les quotas OMDB sont remis à zéro
+                self.day = self.today()
+                self.pending = dict.fromkeys(self.key_ids, 0)
+                self.used = dict.fromkeys(self.key_ids, 0)
+            index = max(range(len(self.key_ids)), key=lambda i: self.daily_quota - self.used[self.key_ids[i]])
+            key_id = self.key_ids[index]
+            if self.used[key_id] >= self.daily_quota:
+                raise KeysExhaustedError("All API keys have been used up.")
+            self.used[key_id] += 1
+            self.pending[key_id] += 1
+        self.bucket.acquire()
+        return key_id, self.api_keys[index]
+
+    def mark_exhausted(self, key_id):
+        """ OMDB a répondu 'Request limit reached!' : la clé est vide jusqu'au lendemain"""
+        with self.lock:
+            remaining = self.daily_quota - self.used[key_id]
+            if remaining > 0:
+                self.used[key_id] += remaining
+                self.pending[key_id] += remaining
+
+    def flush(self):
+        """ Écrit les compteurs en attente en base puis relit les totaux (les autres process ont pu consommer des requêtes)"""
+        with self.lock:
+            day = self.day
+            records = [{"key_id": key_id, "day": day, "nb": nb} for key_id, nb in self.pending.items() if nb]
+            self.pending = dict.fromkeys(self.key_ids, 0)
+        try:
+            if records:
+                add_key_usage(records)
+            usage = get_key_usage(day, self.key_ids)
+        except Exception as e:
+            logging.info(f"API key usage not saved: {e}")
+            with self.lock:
+                for record in records:
+                    self.pending[record["key_id"]] += record["nb"]
+            return
+        with self.lock:
+            if day == self.day:
+                self.used = {key_id: usage.get(key_id, 0) + self.pending[key_id] for key_id in self.key_ids}
+
+
+@st.cache_resource
+def get_key_scheduler():
+    """ Un seul planificateur par process, partagé par toutes les sessions Streamlit"""
+    return KeyScheduler(
+        st.secrets['API_KEY_ARRAY'],
+        OMDB_DAILY_QUOTA,
+        TokenBucket(OMDB_RATE_PER_SECOND, OMDB_BURST)
+    )
@@ -1,5 +1,18 @@
+import streamlit as st
 import pandas as pd
+from datetime import datetime, timedelta, timezone
 from src.db.queries.qr_movie import *
+from src.utils.constants import QUANTILE_MAX_AGE_HOURS, QUANTILE_CACHE_TTL
+from src.utils.utils import to_number, runtime_minutes
+
+
+@st.cache_data(ttl=QUANTILE_CACHE_TTL)
+def load_quantiles(max_age_hours):
+    """ Quantiles de popularité : lus dans movie_quantiles, recalculés seulement s'ils sont trop vieux"""
+    stored = get_stored_quantiles()
+    if stored is None or stored.computed_at < datetime.now(timezone.utc) - timedelta(hours=max_age_hours):
+        return refresh_quantiles()
+    return stored.q1, stored.q2, stored.q3
 
 
 class MovieService:
@@ -16,23 +29,16 @@ class MovieService:
             errors="coerce"
         )
 
-        df_result=get_all_movies(df)
-        df_missing = (
-            df.merge(
-                df_result[["title", "year"]],
-                left_on=["Name", "Year"],
-                right_on=["title", "year"],
-                how="left",
-                indicator=True
-            )
-        )
+        df_result, missing_keys = get_all_movies(df)
+
+        # une ligne par film absent (un film à la fois vu et dans la watchlist n'est demandé qu'une fois)
+        missing = pd.MultiIndex.from_arrays([
+            missing_keys["title"],
+            missing_keys["year"].astype(float)
+        ])
+        keys = pd.MultiIndex.from_arrays([df["Name"], df["Year"].astype(float)])
+        df_missing = df[keys.isin(missing)].drop_duplicates(subset=["Name", "Year"])
 
-        df_missing = df_missing[
-            df_missing["_merge"] == "left_only"
-        ].drop(
-            columns=["title", "year", "_merge"]
-        )
-        
         return df_result, df_missing
 
     
@@ -50,34 +56,22 @@ class MovieService:
         return None
     
 
-    def insert_movies_to_db(self, df):
-        df["imdbVotes"] = (
-        df["imdbVotes"]
-        .astype("string")
-        .str.replace(",", "", regex=False)
-        )
-
-        df["imdbVotes"] = pd.to_numeric(
-            df["imdbVotes"],
-            errors="coerce"
-        ).astype("Int64")
-
+    def parse_movies(self, df):
+        """ Convertit une fois les réponses OMDB en valeurs typées, telles qu'elles sont stockées dans movies :
+        runtime en minutes, imdbVotes / imdbRating / Metascore / Year en nombres ('N/A' -> NaN), Response en booléen.
+        Les films lus ensuite en base n'ont plus rien à reparser."""
+        df = df.copy()
+        df["Runtime"] = runtime_minutes(df["Runtime"]).round().astype("Int64")
+        df["imdbVotes"] = to_number(df["imdbVotes"]).round().astype("Int64")
+        df["imdbRating"] = to_number(df["imdbRating"])
+        df["Metascore"] = to_number(df["Metascore"])
+        df["Year"] = to_number(df["Year"])
         df["Response"] = df["Response"].apply(self.clean_response)
+        return df
 
-        df["Year"] = pd.to_numeric(
-            df["Year"],
-            errors="coerce"
-        )
+    def insert_movies_to_db(self, df):
+        """ Insère dans movies les films de df, déjà passés par parse_movies"""
         df = df.dropna(subset=["Year"])
-        df["Metascore"] = pd.to_numeric(
-            df["Metascore"],
-            errors="coerce"
-        )
-
-        df["imdbRating"] = pd.to_numeric(
-            df["imdbRating"],
-            errors="coerce"
-        )
 
         if df.empty: 
                 return 0 
@@ -90,4 +84,4 @@ class MovieService:
         return save_movies(df)
     
     def get_quantile(self):
-        return compute_quantiles()
\ No newline at end of file
+        return load_quantiles(QUANTILE_MAX_AGE_HOURS)
\ No newline at end of file
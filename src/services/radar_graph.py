@@ -1,11 +1,15 @@
 from src.utils.utils import compute_categories
 import numpy as np
+import pandas as pd
 import json
 
 
-def compute_radar_stats_for_sheet(quartile, watched_df, rating_df, reviews_df, comments_df, profiles_stats):
-    scores = compute_scores(quartile, watched_df, rating_df, reviews_df, comments_df, profiles_stats)
-    markers = compute_markers(quartile, watched_df, rating_df, reviews_df, comments_df)
+def compute_radar_stats(quartile, watched_df, rating_df, reviews_df, comments_df, rank_markers, genres=None):
+    """ Indicateurs du profil et scores du radar. Le classement dans la population est délégué à rank_markers
+    (ex : UserService.get_radar_ranks, calculé par PostgreSQL) : les profils ne sont pas chargés.
+    genres : genres des films vus, un par ligne (table pont), pour éviter de redécouper la colonne genre."""
+    markers = compute_markers(quartile, watched_df, rating_df, reviews_df, comments_df, genres)
+    scores = compute_scores_from_ranks(rank_markers(markers))
     return {**scores, **markers}
 
 ### PARTIE SCORE ###
@@ -16,78 +20,9 @@ def compute_radar_stats_for_sheet(quartile, watched_df, rating_df, reviews_df, c
 #   Éclectique     : Reflète la variété des préférences de l'utilisateur à travers différentes catégories.
 #   Actif          : Représente le niveau d'activité et d'interaction de l'utilisateur sur la plateforme.
 
-# Calcul des scores pour chaque composante
-def compute_scores(quartile, watched_df, rating_df, reviews_df, comments_df, profiles_stats):
-    scores = {
-        "Consommateur": 0,
-        "Explorateur": 0,
-        "Consensuel": 0,
-        "Éclectique": 0,
-        "Actif": 0
-    }
-
-    # Calcul des scores pour chaque composante
-    scores["Consommateur"]  = compute_consommateur_score(watched_df, profiles_stats)
-    scores["Explorateur"]   = compute_explorateur_score(quartile, watched_df, profiles_stats)
-    scores["Consensuel"]    = compute_consensuel_score(rating_df, profiles_stats)
-    scores["Éclectique"]    = compute_eclectique_score(watched_df, profiles_stats)
-    scores["Actif"]         = compute_actif_score(reviews_df, comments_df, profiles_stats)
-
-    return scores
-
-def compute_consommateur_score(watched_df, profiles_stats):
-    marker = compute_consommateur_marker(watched_df)
-    all_markers = np.array(profiles_stats['nb_films_vus'])
-    consommateur = smart_percentile(marker, all_markers)
-    return consommateur
-
-def compute_explorateur_score(quartile, watched_df, profiles_stats):
-    marker = compute_explorateur_marker(quartile, watched_df)
-    all_markers = np.array(profiles_stats['ratio_peu_vus'])
-    explorateur = smart_percentile(marker, all_markers)
-    return explorateur
-
-def compute_consensuel_score(rating_df, profiles_stats):
-    marker = abs(compute_consensuel_marker(rating_df))
-    all_markers = np.array(profiles_stats['moyenne_diff_rating'])
-    all_markers = abs(all_markers)
-    consensuel = smart_percentile(marker, all_markers)
-    return consensuel
-
-def compute_eclectique_score(watched_df, profiles_stats):
-    ratio_par_genre = compute_eclectique_marker(watched_df)
-    user_ratios = json.loads(ratio_par_genre)
-
-    all_ratios = []
-    for r in profiles_stats['ratio_par_genre']:
-        #d = json.loads(r)
-        all_ratios.append(r)
-    
-    all_genres = set()
-    for ratios in all_ratios:
-        all_genres.update(ratios.keys())
-    all_genres = sorted(all_genres)  # pour un ordre fixe
-
-    ratio_matrix = np.array([
-        [ratios.get(genre, 0.0) for genre in all_genres]
-        for ratios in all_ratios
-    ])
-
-    genre_means = np.mean(ratio_matrix, axis=0)
-
-    distances = np.sum(np.abs(ratio_matrix - genre_means), axis=1)
-
-    user_vector = np.array([user_ratios.get(genre, 0.0) for genre in all_genres])
-    user_distance = np.sum(np.abs(user_vector - genre_means))
-
-    eclectique = smart_percentile(user_distance, distances)
-    return eclectique
-
-def compute_actif_score(reviews_df, comments_df, profiles_stats):
-    marker = compute_actif_marker(reviews_df, comments_df)
-    all_marker = np.array(profiles_stats['nb_interactions'])
-    actif = smart_percentile(marker, all_marker)
-    return actif
+# Calcul des scores à partir des comptages (n, n_le, n_eq) de la population pour chaque composante
+def compute_scores_from_ranks(ranks):
+    return {score: rank_score(*counts) for score, counts in ranks.items()}
 
 ###
 
@@ -100,7 +35,7 @@ def compute_actif_score(reviews_df, comments_df, profiles_stats):
 #   Actif          : nombre de commentaires laissés + nombre de reviews laissés
 
 # Calcul des scores pour chaque composante
-def compute_markers(quartile, watched_df, rating_df, reviews_df, comments_df):
+def compute_markers(quartile, watched_df, rating_df, reviews_df, comments_df, genres=None):
     markers = {
         "nb_films_vus": 0,
         "ratio_peu_vus": 0,
@@ -113,7 +48,7 @@ def compute_markers(quartile, watched_df, rating_df, reviews_df, comments_df):
     markers["nb_films_vus"]         = compute_consommateur_marker(watched_df)
     markers["ratio_peu_vus"]        = compute_explorateur_marker(quartile, watched_df)
     markers["moyenne_diff_rating"]  = compute_consensuel_marker(rating_df)
-    markers["ratio_par_genre"]      = compute_eclectique_marker(watched_df)
+    markers["ratio_par_genre"]      = compute_eclectique_marker(watched_df, genres)
     markers["nb_interactions"]      = compute_actif_marker(reviews_df, comments_df)
 
     return markers
@@ -123,7 +58,8 @@ def compute_consommateur_marker(watched_df):
     return marker
 
 def compute_explorateur_marker(quartile, watched_df):
-    marker = int(compute_categories(quartile, watched_df)['number'][0] + compute_categories(quartile, watched_df)['number'][1])
+    counts = compute_categories(quartile, watched_df)['number']
+    marker = int(counts[0] + counts[1])
     marker = round(marker / len(watched_df), 3) if len(watched_df) > 0 else 0
     return marker
 
@@ -131,10 +67,10 @@ def compute_consensuel_marker(rating_df):
     marker = round(rating_df['diff_rating'].mean() if ('diff_rating' in rating_df.columns and len(rating_df['diff_rating']) > 0) else 0, 3)
     return marker
 
-def compute_eclectique_marker(watched_df):
-    genres_series = watched_df['genre'].dropna().apply(lambda x: [g.strip() for g in x.split(',')])
-    exploded_genres = genres_series.explode()
-    genre_counts = exploded_genres.value_counts()
+def compute_eclectique_marker(watched_df, genres=None):
+    if genres is None:
+        genres = watched_df['genre'].dropna().apply(lambda x: [g.strip() for g in x.split(',')]).explode()
+    genre_counts = genres.value_counts()
     total_films = len(watched_df)
     ratio_par_genre = round((genre_counts / total_films), 3).to_dict()
     ratio_par_genre = json.dumps(ratio_par_genre, ensure_ascii=False)
@@ -146,19 +82,135 @@ def compute_actif_marker(reviews_df, comments_df):
 
 ### PARTIE INDICATEURS ###
 
-def smart_percentile(marker, all_markers):
-    all_markers = list(all_markers)
-    if marker in all_markers:
-        all_markers.remove(marker)
-    if not all_markers:
+def rank_score(n, n_le, n_eq):
+    """ Score (1 à 99) d'un marker à partir des comptages de la population : n profils, n_le <= marker, n_eq == marker.
+    Si le marker figure dans la population (n_eq > 0), une occurrence est retirée (le profil lui-même)."""
+    if n_eq > 0:
+        n -= 1
+        n_le -= 1
+    if n <= 0:
         return 50
-    count = np.sum(np.array(all_markers) <= marker)
-    percentile = count / len(all_markers)
-    score = int(round(percentile * 100))
+    score = int(round(n_le / n * 100))
 
     if score == 0:
         score = 1
     elif score == 100:
         score = 99
 
-    return score
\ No newline at end of file
+    return score
+
+class PercentileIndex:
+    """ Index de rang sur un instantané de la population : trié une seule fois,
+    chaque requête est ensuite un searchsorted (O(log n)) au lieu d'une comparaison sur toute la population."""
+
+    def __init__(self, population):
+        self.sorted = np.sort(np.asarray(population, dtype=float))
+
+    def counts(self, markers):
+        """ (n, n_le, n_eq) pour un marker ou un tableau de markers"""
+        markers = np.asarray(markers, dtype=float)
+        n_le = np.searchsorted(self.sorted, markers, side='right')
+        n_lt = np.searchsorted(self.sorted, markers, side='left')
+        return len(self.sorted), n_le, n_le - n_lt
+
+    def score(self, marker):
+        n, n_le, n_eq = self.counts(marker)
+        return rank_score(n, int(n_le), int(n_eq))
+
+    def scores(self, markers):
+        """ Scores de plusieurs markers en un seul appel vectorisé, avec la même règle que rank_score"""
+        n, n_le, n_eq = self.counts(markers)
+        present = (n_eq > 0).astype(int)
+        n_others = n - present
+        n_le = n_le - present
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.rint(n_le / n_others * 100)
+        scores = np.clip(scores, 1, 99)
+        scores = np.where(n_others <= 0, 50, scores)
+        return scores.astype(int)
+
+class GenreDistanceModel:
+    """ Modèle de la population pour le score Éclectique : vocabulaire des genres, vecteurs des profils,
+    vecteur moyen et index des distances L1 à la moyenne.
+    Construit une fois à partir de {id: ratio_par_genre}, puis mis à jour profil par profil (update_profile)."""
+
+    def __init__(self, profiles, version=None):
+        self.version = version
+        self.ids = list(profiles)
+        self.positions = {profile_id: i for i, profile_id in enumerate(self.ids)}
+        genres = set()
+        for ratios in profiles.values():
+            genres.update(ratios.keys())
+        self.genres = sorted(genres)  # pour un ordre fixe
+        self.genre_positions = {genre: j for j, genre in enumerate(self.genres)}
+        self.matrix = np.zeros((len(self.ids), len(self.genres)))
+        for i, ratios in enumerate(profiles.values()):
+            self.matrix[i] = self.vector(ratios)
+        self.refresh()
+
+    def vector(self, ratios):
+        """ Vecteur d'un profil sur le vocabulaire du modèle (les genres inconnus sont ignorés)"""
+        vector = np.zeros(len(self.genres))
+        for genre, ratio in ratios.items():
+            j = self.genre_positions.get(genre)
+            if j is not None:
+                vector[j] = ratio
+        return vector
+
+    def refresh(self):
+        """ Recalcule la moyenne et les distances : la moyenne bouge dès qu'un profil change,
+        donc toutes les distances aussi (calcul numpy, sans aller en base)"""
+        if len(self.ids):
+            self.means = self.matrix.mean(axis=0)
+        else:
+            self.means = np.zeros(len(self.genres))
+        self.distances = np.abs(self.matrix - self.means).sum(axis=1)
+        self.index = PercentileIndex(self.distances)
+
+    def distance(self, ratios):
+        return np.abs(self.vector(ratios) - self.means).sum()
+
+    def counts(self, ratios):
+        """ (n, n_le, n_eq) de la distance du profil dans la population"""
+        n, n_le, n_eq = self.index.counts(self.distance(ratios))
+        return n, int(n_le), int(n_eq)
+
+    def score(self, ratios):
+        return rank_score(*self.counts(ratios))
+
+    def update_profile(self, profile_id, ratios):
+        """ Ajoute ou remplace un profil (appelé après add_profile_to_stats)"""
+        new_genres = sorted(set(ratios) - set(self.genre_positions))
+        if new_genres:
+            for genre in new_genres:
+                self.genre_positions[genre] = len(self.genres)
+                self.genres.append(genre)
+            self.matrix = np.hstack([self.matrix, np.zeros((len(self.ids), len(new_genres)))])
+        if profile_id in self.positions:
+            self.matrix[self.positions[profile_id]] = self.vector(ratios)
+        else:
+            self.positions[profile_id] = len(self.ids)
+            self.ids.append(profile_id)
+            self.matrix = np.vstack([self.matrix, self.vector(ratios)])
+        self.refresh()
+
+### RECALCUL HORS LIGNE ###
+
+def score_population(profiles_stats):
+    """ Recalcule les cinq scores de tous les profils de profiles_stats en un passage.
+    Chaque profil fait partie de la population : il est exclu de son propre classement par la règle de rank_score."""
+    scores = pd.DataFrame({'id': profiles_stats['id']})
+
+    for score, column in [('Consommateur', 'nb_films_vus'), ('Explorateur', 'ratio_peu_vus'), ('Actif', 'nb_interactions')]:
+        markers = np.asarray(profiles_stats[column], dtype=float)
+        scores[score] = PercentileIndex(markers).scores(markers)
+
+    markers = np.abs(np.asarray(profiles_stats['moyenne_diff_rating'], dtype=float))
+    scores['Consensuel'] = PercentileIndex(markers).scores(markers)
+
+    # même modèle que le classement en ligne (GenreModelCache) : une seule définition de la distance
+    ratios = [r if isinstance(r, dict) else {} for r in profiles_stats['ratio_par_genre']]
+    model = GenreDistanceModel(dict(zip(profiles_stats['id'], ratios)))
+    scores['Éclectique'] = model.index.scores(model.distances)
+
+    return scores
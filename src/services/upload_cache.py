@@ -0,0 +1,197 @@
+# modules externes
+import streamlit as st
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import stat
+import time
+import uuid
+import pandas as pd
+
+# modules internes
+from src.utils.lru_cache import LRUCache
+from src.utils.constants import UPLOAD_CACHE_MEMORY_ENTRIES, UPLOAD_CACHE_DISK_ENTRIES, UPLOAD_CACHE_TTL, UPLOAD_CACHE_DIR
+
+# Description de l'entrée, à côté des fichiers parquet
+META_FILE = "meta.json"
+# Suffixe des entrées en cours d'écriture
+TMP_SUFFIX = ".tmp"
+
+
+def fingerprint_bytes(*contents):
+    """ Empreinte sha256 d'un ou plusieurs contenus (zip uploadé, CSV de l'exemple...)"""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def to_json_value(value):
+    """ Valeur Python -> valeur JSON. Les dict dont les clés ne sont pas toutes des str (ex : années du review_index)
+    sont gardés sous forme de paires pour retrouver des clés int ; les types numpy deviennent des types Python."""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: to_json_value(item) for key, item in value.items()}
+        return {"__items__": [[to_json_value(key), to_json_value(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    if hasattr(value, "item"):  # scalaire numpy
+        return value.item()
+    return value
+
+
+def from_json_value(value):
+    if isinstance(value, dict):
+        if set(value) == {"__items__"}:
+            return {from_json_value(key): from_json_value(item) for key, item in value["__items__"]}
+        return {key: from_json_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_json_value(item) for item in value]
+    return value
+
+
+def private_directory(path):
+    """ Crée path en 0o700 s'il n'existe pas, et vérifie qu'il appartient à l'utilisateur courant,
+    n'est pas un lien symbolique et n'est lisible par personne d'autre. Renvoie False sinon."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        logging.warning(f"upload cache directory unusable: {e}")
+        return False
+    getuid = getattr(os, "getuid", None)
+    if not stat.S_ISDIR(info.st_mode):
+        logging.warning(f"upload cache directory {path} is not a directory")
+        return False
+    if getuid is not None and info.st_uid != getuid():
+        logging.warning(f"upload cache directory {path} is not owned by the current user")
+        return False
+    if info.st_mode & 0o077:
+        logging.warning(f"upload cache directory {path} is accessible to other users")
+        return False
+    return True
+
+
+def default_cache_directory():
+    """ Dossier de cache de l'utilisateur qui fait tourner l'application (XDG_CACHE_HOME ou ~/.cache)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, UPLOAD_CACHE_DIR)
+
+
+class UploadCache:
+    """ Résultats d'upload indexés par l'empreinte du contenu.
+    Deux niveaux : un LRU en mémoire et, sur disque, un dossier par entrée (évincés du plus ancien au plus récent accès).
+    Sur disque, les DataFrames sont en parquet et le reste en JSON : rien n'est exécuté à la relecture (pas de pickle).
+    Le niveau disque n'est utilisé que si le dossier est privé (voir private_directory) et pyarrow installé.
+    Une entrée plus vieille que ttl secondes est ignorée : de nouveaux films ont pu arriver en base entre-temps."""
+
+    def __init__(self, memory_entries, disk_entries, ttl, directory):
+        self.memory = LRUCache(memory_entries)
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.directory = directory
+        if importlib.util.find_spec("pyarrow") is None:
+            logging.info("pyarrow not installed: upload cache kept in memory only")
+            self.directory = None
+        elif not private_directory(directory):
+            self.directory = None
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = self.read_disk(key)
+            if entry is None:
+                return None
+            self.memory.put(key, entry)
+        created, data = entry
+        if time.time() - created > self.ttl:
+            self.memory.pop(key)
+            self.remove_disk(key)
+            return None
+        return data
+
+    def put(self, key, data):
+        entry = (time.time(), data)
+        self.memory.put(key, entry)
+        if self.directory is None:
+            return
+        # nom unique : deux sessions (threads du même process) peuvent écrire la même empreinte en même temps
+        tmp_path = f"{self.path(key)}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+        try:
+            self.write_entry(tmp_path, entry)
+            self.remove_disk(key)
+            os.rename(tmp_path, self.path(key))  # l'entrée n'apparaît que complète
+            self.evict_disk()
+        except Exception as e:
+            logging.info(f"upload cache not written: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def write_entry(self, path, entry):
+        """ Un fichier parquet par DataFrame (y compris dans un dict de DataFrames, ex : bridges), le reste dans META_FILE"""
+        created, data = entry
+        os.mkdir(path, mode=0o700)
+        meta = {"created": created, "frames": {}, "values": {}}
+        for attr, value in data.items():
+            if isinstance(value, pd.DataFrame):
+                value.to_parquet(os.path.join(path, f"{attr}.parquet"))
+                meta["frames"][attr] = None
+            elif isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+                for name, frame in value.items():
+                    frame.to_parquet(os.path.join(path, f"{attr}.{name}.parquet"))
+                meta["frames"][attr] = list(value)
+            else:
+                meta["values"][attr] = to_json_value(value)
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            data = {attr: from_json_value(value) for attr, value in meta["values"].items()}
+            for attr, names in meta["frames"].items():
+                if names is None:
+                    data[attr] = pd.read_parquet(os.path.join(path, f"{attr}.parquet"))
+                else:
+                    data[attr] = {name: pd.read_parquet(os.path.join(path, f"{attr}.{name}.parquet")) for name in names}
+            os.utime(path)  # la date d'accès sert d'ordre LRU
+            return meta["created"], data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.info(f"upload cache entry unreadable: {e}")
+            self.remove_disk(key)
+            return None
+
+    def remove_disk(self, key):
+        if self.directory is not None:
+            shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def evict_disk(self):
+        # les dossiers .tmp sont des entrées en cours d'écriture : on n'y touche pas
+        entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if not name.endswith(TMP_SUFFIX)]
+        if len(entries) <= self.disk_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.disk_entries]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+@st.cache_resource
+def get_upload_cache():
+    """ Un seul cache par process, partagé par toutes les sessions"""
+    return UploadCache(
+        UPLOAD_CACHE_MEMORY_ENTRIES,
+        UPLOAD_CACHE_DISK_ENTRIES,
+        UPLOAD_CACHE_TTL,
+        default_cache_directory()
+    )
@@ -1,4 +1,43 @@
+import streamlit as st
+import json
+import threading
 from src.db.queries.qr_user import *
+from src.services.radar_graph import score_population, GenreDistanceModel
+
+
+class GenreModelCache:
+    """ Garde le GenreDistanceModel de la population entre les uploads.
+    Il est reconstruit seulement si user_stats a changé ailleurs (autre process), sinon mis à jour sur place."""
+
+    def __init__(self):
+        self.model = None
+        self.lock = threading.Lock()
+
+    def counts(self, ratios):
+        """ (n, n_le, n_eq) du profil dans la population, voir GenreDistanceModel.counts"""
+        version = get_user_stats_version()
+        with self.lock:
+            if self.model is None or self.model.version != version:
+                self.model = GenreDistanceModel(get_genre_ratios(), version)
+            return self.model.counts(ratios)
+
+    def update_profile(self, profile_id, ratios):
+        with self.lock:
+            if self.model is None:
+                return
+            count, passages = self.model.version
+            if profile_id not in self.model.positions:
+                count += 1
+            self.model.update_profile(profile_id, ratios)
+            # même empreinte que celle qu'aura user_stats après l'upsert de ce profil
+            self.model.version = (count, passages + 1)
+
+
+@st.cache_resource
+def get_genre_model_cache():
+    """ Un seul cache par process, partagé par toutes les sessions"""
+    return GenreModelCache()
+
 
 class UserService:
 
@@ -26,6 +65,20 @@ class UserService:
     def add_profiles_to_db(self, profile, radar_stats):
             """ Ajoute ou met à jour les scores d'un profil dans la base de données"""
             add_profile_to_stats(profile, radar_stats)
+            get_genre_model_cache().update_profile(profile["Username"], json.loads(radar_stats["ratio_par_genre"]))
+
+    def get_radar_ranks(self, markers):
+        """ Classe les indicateurs d'un profil dans la population :
+        côté PostgreSQL pour les indicateurs numériques, avec le modèle de genres en cache pour Éclectique"""
+        ranks = get_radar_ranks(markers)
+        ranks["Éclectique"] = get_genre_model_cache().counts(json.loads(markers["ratio_par_genre"]))
+        return ranks
 
-    def get_all_user_stats(self):
-        return get_user_stats()
\ No newline at end of file
+    def recompute_all_scores(self):
+        """ Recalcul hors ligne : reclasse tous les profils sur la population actuelle et sauvegarde les scores"""
+        profiles_stats = get_user_stats()
+        if profiles_stats.empty:
+            return profiles_stats
+        scores = score_population(profiles_stats)
+        update_user_scores(scores)
+        return scores
\ No newline at end of file
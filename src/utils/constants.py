@@ -6,4 +6,48 @@ PALETTE = {
             'bleu' : '#40BCF4',
             'blanc' : '#FFFFFF',
             'gris' : '#202831'
-        }
\ No newline at end of file
+        }
+
+# Nombre maximum de requêtes OMDB en vol simultanément
+OMDB_MAX_WORKERS = 8
+
+# Session HTTP OMDB : timeouts (connexion, lecture) en secondes, taille du pool et politique de retry
+OMDB_TIMEOUT = (3.05, 10)
+OMDB_POOL_SIZE = OMDB_MAX_WORKERS
+OMDB_MAX_RETRIES = 3
+OMDB_BACKOFF_FACTOR = 0.5
+OMDB_BACKOFF_JITTER = 0.3
+OMDB_RETRY_STATUS = (500, 502, 503, 504)
+
+# Quota journalier d'une clé OMDB (offre gratuite) et débit maximal envoyé à l'API (token bucket)
+OMDB_DAILY_QUOTA = 1000
+OMDB_RATE_PER_SECOND = 10
+OMDB_BURST = OMDB_MAX_WORKERS
+
+# Cache négatif : un film qui a échoué au moins NEGATIVE_CACHE_MIN_NB fois n'est plus demandé à OMDB
+# pendant NEGATIVE_CACHE_TTL_DAYS jours après son dernier échec. La liste est relue toutes les NEGATIVE_CACHE_REFRESH secondes.
+NEGATIVE_CACHE_MIN_NB = 3
+NEGATIVE_CACHE_TTL_DAYS = 30
+NEGATIVE_CACHE_REFRESH = 3600
+# Erreurs OMDB propres à un titre (réponse 200) : les seules enregistrées dans errors
+# (une erreur de clé ou de compte, ex : 'Invalid API key!', mettrait des films valides dans le cache négatif)
+OMDB_TITLE_ERRORS = ("Movie not found!", "Incorrect IMDb ID.")
+
+# Quantiles de popularité (imdbVotes) : recalculés en base au plus toutes les QUANTILE_MAX_AGE_HOURS heures,
+# relus par chaque process au plus toutes les QUANTILE_CACHE_TTL secondes
+QUANTILE_MAX_AGE_HOURS = 24
+QUANTILE_CACHE_TTL = 3600
+
+# Cache des uploads (clé = empreinte du contenu) : entrées gardées en mémoire / sur disque, durée de vie en secondes
+UPLOAD_CACHE_MEMORY_ENTRIES = 8
+UPLOAD_CACHE_DISK_ENTRIES = 64
+UPLOAD_CACHE_TTL = 24 * 3600
+UPLOAD_CACHE_DIR = "letterboxd_upload_cache"
+# À incrémenter quand le contenu mis en cache change de forme (nouvel attribut, nouvelle colonne...)
+UPLOAD_CACHE_VERSION = 6
+
+# Taille maximale (décompressée, en octets) d'un CSV lu dans l'archive uploadée
+UPLOAD_MAX_MEMBER_SIZE = 50 * 1024 * 1024
+
+# Nombre de graphiques gardés en mémoire par session (DataHandler.chart_cache)
+CHART_CACHE_ENTRIES = 64
@@ -5,7 +5,6 @@ import numpy as np
 import string
 import math
 from datetime import date
-from typing import Any, List, Tuple
 
 # Configuration de Sentry pour la gestion des erreurs
 # def setup_sentry():
@@ -26,68 +25,91 @@ def sanitize(value):
     return value
 
 def clean_year(df):
-    df = df[pd.to_numeric(df['Year'], errors='coerce').notna()]
-    df['Year'] = df['Year'].astype(float)
+    # Year est déjà lu en float (schéma CSV) : il reste à retirer les films sans année
+    return df.dropna(subset=['Year'])
+
+def to_number(values):
+    """ Colonne OMDB ('1,234', '7.5', 'N/A', '') en float, de façon vectorisée ; les valeurs illisibles deviennent NaN.
+    Une colonne déjà numérique (films lus en base, ou déjà normalisés) est seulement convertie en float."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return pd.to_numeric(values.astype('string').str.replace(',', '', regex=False), errors='coerce').astype(float)
+
+def runtime_minutes(values):
+    """ Durée en minutes à partir de '142 min' ; les durées en secondes ('45s') et 'N/A' deviennent NaN"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return to_number(values.astype('string').str.split(' ').str[0])
+
+def normalize_movies(df):
+    """ imdbVotes, imdbRating, runtime (minutes) et year en float.
+    Ces colonnes sont stockées en nombres dans movies (MovieService.parse_movies) : pour les films lus en base,
+    ce n'est qu'un changement de type ; seules des valeurs texte (anciennes lignes) seraient parsées."""
+    df = df.copy()
+    df['imdbVotes'] = to_number(df['imdbVotes'])
+    df['imdbRating'] = to_number(df['imdbRating'])
+    df['runtime'] = runtime_minutes(df['runtime'])
+    df['year'] = to_number(df['year'])
     return df
 
 def clean_imdbv(df):
-    df['imdbVotes'] = df['imdbVotes'].replace("N/A", np.nan)
-    df = df.dropna(subset=['imdbVotes'])
-    df['imdbVotes'] = df['imdbVotes'].str.replace(',', '').astype(float)
-    return df
+    df = df.assign(imdbVotes=to_number(df['imdbVotes']))
+    return df.dropna(subset=['imdbVotes'])
 
 def clean_imdbr(df):
-    df['imdbRating'] = df['imdbRating'].replace("N/A", np.nan)
-    df = df.dropna(subset=['imdbRating'])
-    df['imdbRating'] = df['imdbRating'].apply(lambda x: float(x) if x != '' else None)
-    return df
+    df = df.assign(imdbRating=to_number(df['imdbRating']))
+    return df.dropna(subset=['imdbRating'])
 
 def clean_runtime(df):
-    df['runtime']=df['runtime'].str.split(' ').str[0]
-    df = df[df['runtime'].notna() & ~df['runtime'].str.contains('s', case=False, na=True)] #remove the runtime in seconde
-    df['runtime'] = df['runtime'].str.replace(',', '', regex=False)
-    df['runtime'] = df['runtime'].apply(lambda x: int(x) if x not in ['', 'N/A'] else None)
+    df = df.assign(runtime=runtime_minutes(df['runtime']))
     df = df.dropna(subset=['runtime'])
     df['runtime'] = df['runtime'].astype(int)
     return df
 
-def clean_reviews(df):
-    def clean_text(text):
-        if not isinstance(text, str):
-            return ''
-        # Minuscule
-        text = text.lower()
-        # Remplacer apostrophes et retours à la ligne
-        text = text.replace("'", " ").replace("\n", " ")
-        # Supprimer ponctuation
-        text = text.translate(str.maketrans('', '', string.punctuation))
-        # Normaliser et supprimer accents
-        #text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
-        #supprime les mots en dessous de 3 char
-        words = text.split()
-        words = [word for word in words if len(word) >= 3]
-        text = ' '.join(words)
-        return text.strip()
-    
-    return df['Review'].apply(clean_text)
+# Ponctuation retirée des critiques (table construite une seule fois)
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+@st.cache_resource
+def get_review_stopwords():
+    """ Mots vides français, anglais et espagnols, chargés une fois par process"""
+    from stop_words import get_stop_words
+    return frozenset(get_stop_words('fr')) | frozenset(get_stop_words('en')) | frozenset(get_stop_words('es'))
+
+def tokenize_reviews(df):
+    """ Mots des critiques, un par ligne (index = critique) : en minuscules, sans ponctuation, d'au moins 3 caractères"""
+    text = (
+        df['Review'].astype('string').fillna('').str.lower()
+        .str.replace("'", " ", regex=False)
+        .str.replace("\n", " ", regex=False)
+        .str.translate(PUNCTUATION_TABLE)
+    )
+    words = text.str.split().explode()
+    return words[words.str.len() >= 3]
+
+def build_review_index(df, stopwords):
+    """ Fréquence des mots des critiques, pour chaque année de Date et pour "Alltime" : {année: {mot: nombre}}.
+    Les mots vides et les nombres sont retirés ici, une fois par upload, plutôt qu'à chaque rendu du wordcloud."""
+    words = tokenize_reviews(df)
+    words = words[~words.isin(stopwords) & ~words.str.isdigit()]
+    years = df['Date'].dt.year.loc[words.index].to_numpy()
+
+    review_index = {"Alltime": words.value_counts().to_dict()}
+    for year, year_words in words.groupby(years):
+        review_index[int(year)] = year_words.value_counts().to_dict()
+    return review_index
 
 def clean_votes(df):
     """Nettoie la colonne 'imdbVotes' d'un DataFrame et la convertit en float."""
-    votes = df.copy()
-    votes['imdbVotes'] = votes['imdbVotes'].replace(["N/A", ""], np.nan)
-    votes = votes.dropna(subset=['imdbVotes'])
-    votes['imdbVotes'] = votes['imdbVotes'].astype(str).str.replace(',', '')
-    votes['imdbVotes'] = votes['imdbVotes'].apply(lambda x: float(x) if x not in ['', 'N/A', None] else np.nan)
-    votes = votes.dropna(subset=['imdbVotes'])
-    return votes
+    return clean_imdbv(df)
 
 def clean_small_films(df):
     if df is None or df.empty:
         return pd.DataFrame()
-    clean_df = clean_votes(df)
+    clean_df = normalize_movies(df)
+    clean_df = clean_df.dropna(subset=['imdbVotes'])
     clean_df = clean_runtime(clean_df)
-    clean_df = clean_df[pd.to_numeric(clean_df['runtime'], errors='coerce') >= 5]
-    mask = ~((pd.to_numeric(clean_df['runtime'], errors='coerce') < 20) & (clean_df['imdbVotes'] < 1000))
+    clean_df = clean_df[clean_df['runtime'] >= 5]
+    mask = ~((clean_df['runtime'] < 20) & (clean_df['imdbVotes'] < 1000))
     clean_df = clean_df[mask]
     return clean_df
 
@@ -95,20 +117,41 @@ def clean_small_films(df):
 
 ## DATASET EXTRACTION FUNCTIONS ##
 
+def explode_column(movies, column):
+    """ Découpe une colonne 'a, b, c' de movies : une valeur par ligne, indexée par movie_id"""
+    values = movies.set_index('movie_id')[column].dropna().str.split(',').explode().str.strip()
+    return values[values != '']
+
+def build_bridges(movies):
+    """ Tables pont (format long) construites une fois par upload à partir des films (colonne movie_id) :
+    genres (movie_id, genre), people (movie_id, person, role) et countries (movie_id, country).
+    Les valeurs sont catégorielles : chaque nom n'est stocké qu'une fois."""
+    people = pd.concat(
+        [explode_column(movies, 'actors'), explode_column(movies, 'director')],
+        keys=['actor', 'director'], names=['role', 'movie_id']
+    ).rename('person').reset_index()
+    bridges = {
+        'genres':    explode_column(movies, 'genre').reset_index(),
+        'people':    people[['movie_id', 'person', 'role']],
+        'countries': explode_column(movies, 'country').reset_index(),
+    }
+    return {
+        name: bridge.astype({column: 'category' for column in bridge.columns.drop('movie_id')})
+        for name, bridge in bridges.items()
+    }
+
+def partition_by_year(df):
+    """ Découpe df selon l'année de Date, en une seule passe : {année: sous-DataFrame}"""
+    return {int(year): part for year, part in df.groupby(df['Date'].dt.year)}
+
 def extract_year(df, year):
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    # Date est déjà une date (schéma CSV)
     df_year = df[df['Date'].dt.year == year]
     return df_year
 
 def computeRuntime(df):
-    df['runtime']=df['runtime'].replace('nan', np.nan)
-    df = df.dropna(subset=['runtime'])
-    df['runtime'] = df['runtime'].astype(str).str.replace(r'[Ss]', '5', regex=True)
-
-    runtimeW=df['runtime'].str.split(' ').str[0]
-    runtimeW = runtimeW.apply(lambda x: int(x) if x not in ['', 'N/A'] else None)
-    runtimeW=runtimeW.sum() / 60
-    return runtimeW
+    """ Durée totale en heures (runtime est déjà en minutes, cf. normalize_movies)"""
+    return runtime_minutes(df['runtime']).sum() / 60
 
 def compute_quantiles(df):
     if df is None or df.empty:
@@ -120,35 +163,38 @@ def compute_quantiles(df):
     q3 = np.quantile(clean_df['imdbVotes'], 0.50)
     return q1, q2, q3
 
-def compute_categories(quartile, df):
-    q1, q2, q3 = quartile
-    clean_df = clean_votes(df)
+# Catégories de popularité, de la moins à la plus populaire
+CATEGORIES = ['Obscure', 'Lesser-known', 'Well-known', 'Mainstream']
 
-    intervals = [
-        (clean_df['imdbVotes'] <= q1),             
-        (clean_df['imdbVotes'] > q1) & (clean_df['imdbVotes'] <= q2),  
-        (clean_df['imdbVotes'] > q2) & (clean_df['imdbVotes'] <= q3),  
-        (clean_df['imdbVotes'] > q3)               
-    ]
+def categorize_votes(votes, quartile):
+    """ Catégorie de popularité de chaque film, en catégoriel ordonné :
+    Obscure <= q1 < Lesser-known <= q2 < Well-known <= q3 < Mainstream"""
+    codes = np.digitize(votes, quartile, right=True)
+    return pd.Categorical.from_codes(codes, categories=CATEGORIES, ordered=True)
 
-    counts = [len(clean_df[intervals[i]]) for i in range(4)]
+def compute_categories(quartile, df):
+    """ Nombre de films et titres (Films) par catégorie de popularité, en un seul groupby.
+    Les 4 catégories sont toujours présentes, dans l'ordre ; la colonne category de bind_categories est réutilisée si elle existe."""
+    if 'category' in df.columns:
+        clean_df = df
+        categories = df['category']
+    else:
+        clean_df = clean_votes(df)
+        categories = categorize_votes(clean_df['imdbVotes'], quartile)
+
+    grouped = clean_df.groupby(categories, observed=False)['title']
     result = pd.DataFrame({
-        'category': ['Obscure', 'Lesser-known', 'Well-known', 'Mainstream'],
-        'number': counts
+        'category': CATEGORIES,
+        'number': grouped.size().to_numpy(),
+        'Films': grouped.agg(list).to_numpy()
     })
     return result
 
 ##
 
 def bind_categories(ref,quartile):
-    q1, q2, q3 = quartile
     clean_ref = clean_votes(ref)
-    clean_ref['category'] = clean_ref['imdbVotes'].apply(
-        lambda x: 'Obscure' if x <= q1 else
-                  'Lesser-known' if q1 < x <= q2 else
-                  'Well-known' if q2 < x <= q3 else
-                  'Mainstream'
-    )
+    clean_ref['category'] = categorize_votes(clean_ref['imdbVotes'], quartile)
     return clean_ref
 
 def make_movies_text(movie_list):
@@ -173,21 +219,3 @@ def get_year_bounds(year):
     first_day = date(year, 1, 1)
     last_day = date(year, 12, 31)
     return first_day, last_day
-
-def get_date_coordinates(data: pd.DataFrame, x: str) -> Tuple[Any, List[float], List[int]]:
-    month_days = []
-    for m in data[x].dt.month.unique():
-        month_days.append(data.loc[data[x].dt.month == m, x].max().day)
-
-    month_positions = np.linspace(1.5, 50, 12)
-    weekdays_in_year = [i.weekday() for i in data[x]]
-
-    # sometimes the last week of the current year conflicts with next year's january
-    # pandas uses ISO weeks, which will give those weeks the number 52 or 53, but this
-    # is bad news for this plot therefore we need a correction to use Gregorian weeks,
-    # for a more in-depth explanation check
-    # https://stackoverflow.com/questions/44372048/python-pandas-timestamp-week-returns-52-for-first-day-of-year
-    weeknumber_of_dates = data[x].dt.strftime("%W").astype(int).tolist()
-
-    return month_positions, weekdays_in_year, weeknumber_of_dates
-